@@ -0,0 +1,91 @@
+# aggregation.py
+"""
+Chart-sized views of a user's daily totals.
+
+The history is bucketed by day, week or month in SQL so that a range fits
+in the requested number of points, and if it still does not fit (a narrow
+chart over a long range) the series is downsampled with
+Largest-Triangle-Three-Buckets, which keeps the visual peaks and dips.
+The number of points - and so the render cost - follows the chart width,
+not the length of the account's history.
+"""
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from db import fetch_bucketed_totals, get_log_date_range
+
+# range selector choices: label -> days back from the last logged day (None = everything)
+RANGES: Dict[str, Optional[int]] = {
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last year": 365,
+    "All time": None,
+}
+DEFAULT_RANGE = "Last 90 days"
+PIXELS_PER_POINT = 6
+BUCKET_DAYS = (("day", 1), ("week", 7), ("month", 30))
+
+
+def max_points_for_width(width_px: int) -> int:
+    return max(10, width_px // PIXELS_PER_POINT)
+
+
+def choose_bucket(start: date, end: date, max_points: int) -> str:
+    """Finest bucket that keeps the range within max_points."""
+    span = (end - start).days + 1
+    for bucket, days in BUCKET_DAYS:
+        if span / days <= max_points:
+            return bucket
+    return "month"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of `threshold` points chosen by Largest-Triangle-Three-Buckets
+    (Steinarsson 2013). The first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)  # bucket bounds over the inner points
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket (or the last point) is the third triangle vertex
+        nxt_lo, nxt_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        areas = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(areas))
+        keep[i + 1] = a
+    return keep
+
+
+def fetch_series(conn, user_id: int, range_label: str = DEFAULT_RANGE, max_points: int = 100) -> pd.DataFrame:
+    """
+    Daily totals for the chosen range with at most max_points rows, in the
+    same shape as fetch_past_logs_for_plot. The `bucket` attribute of the
+    result records the bucket size used ("day", "week" or "month").
+    """
+    first, last = get_log_date_range(conn, user_id)
+    if first is None:
+        df = fetch_bucketed_totals(conn, user_id)
+        df.attrs["bucket"] = "day"
+        return df
+    end = date.fromisoformat(last)
+    days = RANGES[range_label]
+    start = max(date.fromisoformat(first), end - timedelta(days=days - 1)) if days else date.fromisoformat(first)
+
+    bucket = choose_bucket(start, end, max_points)
+    df = fetch_bucketed_totals(conn, user_id, bucket, start.isoformat(), end.isoformat())
+    if len(df) > max_points:
+        x = pd.to_datetime(df["Date"]).values.astype("datetime64[D]").astype(np.int64)
+        df = df.iloc[lttb(x, df["Calories"].to_numpy(), max_points)].reset_index(drop=True)
+    df.attrs["bucket"] = bucket
+    return df
@@ -0,0 +1,179 @@
+# analytics.py
+"""
+Recommendation and achievement rules over users' daily nutrient totals.
+
+All rules are evaluated as vectorized pandas/NumPy expressions over a frame
+of (user_id, Date, Calories, Carbs, Protein, Fat) rows, so the same code
+serves one user (dashboard, API) and every user at once (admin reports).
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from db import ACTIVITY_FACTORS, DEFAULT_ACTIVITY_FACTOR, fetch_past_logs_for_plot, get_user_streak
+
+DEFAULT_CALORIE_GOAL = 2000
+GOAL_BAND = (0.9, 1.1)      # within +-10% of the calorie goal counts as a hit
+PROTEIN_MIN = 50
+CARBS_MIN = 130
+FAT_MAX = 70
+GOAL_DAYS_TARGET = 5
+PROTEIN_DAYS_TARGET = 5
+STREAK_TARGET = 7
+
+PROFILE_COLUMNS = ["id", "age", "gender", "height", "weight", "activity_level", "weight_goal"]
+NUTRIENT_COLUMNS = ["Calories", "Carbs", "Protein", "Fat"]
+
+
+def calorie_goals(profiles: pd.DataFrame) -> pd.Series:
+    """
+    Mifflin-St Jeor daily calorie goal per row of `profiles` (same rules as
+    db.predict_calorie_goal). Incomplete profiles get DEFAULT_CALORIE_GOAL.
+    """
+    age = pd.to_numeric(profiles["age"], errors="coerce")
+    height = pd.to_numeric(profiles["height"], errors="coerce")
+    weight = pd.to_numeric(profiles["weight"], errors="coerce")
+    male = profiles["gender"].astype(str).str.lower().eq("male")
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(male, 5, -161)
+    factor = profiles["activity_level"].astype(str).str.lower().map(ACTIVITY_FACTORS).fillna(DEFAULT_ACTIVITY_FACTOR)
+    weight_goal = profiles["weight_goal"].astype(str).str.lower()
+    adjust = np.select([weight_goal.eq("lose"), weight_goal.eq("gain")], [-500, 500], 0)
+    goals = np.trunc(bmr * factor + adjust)
+    return pd.Series(goals, index=profiles.index).fillna(DEFAULT_CALORIE_GOAL).astype(int)
+
+
+def streaks(daily: pd.DataFrame) -> pd.DataFrame:
+    """Current (run ending at the latest logged day) and longest streak per user_id."""
+    if daily.empty:
+        return pd.DataFrame(columns=["current_streak", "longest_streak"], dtype=int)
+    days = daily[["user_id", "Date"]].drop_duplicates().sort_values(["user_id", "Date"])
+    day_number = pd.Series(pd.to_datetime(days["Date"]).values.astype("datetime64[D]").astype(np.int64),
+                           index=days.index)
+    new_run = (day_number.diff() != 1) | days["user_id"].ne(days["user_id"].shift())
+    run_id = new_run.cumsum()
+    run_len = run_id.map(run_id.value_counts())
+    per_user = pd.DataFrame({"user_id": days["user_id"].values, "run_len": run_len.values})
+    grouped = per_user.groupby("user_id")["run_len"]
+    return pd.DataFrame({"current_streak": grouped.last(), "longest_streak": grouped.max()})
+
+
+def compute_metrics(daily: pd.DataFrame, goals: pd.Series) -> pd.DataFrame:
+    """
+    One row per user_id with averages, goal-hit and protein day counts and
+    rule flags. `daily` has user_id, Date and NUTRIENT_COLUMNS; `goals` is
+    indexed by user_id.
+    """
+    goal = daily["user_id"].map(goals).fillna(DEFAULT_CALORIE_GOAL)
+    frame = daily.assign(
+        hit_goal=daily["Calories"].between(goal * GOAL_BAND[0], goal * GOAL_BAND[1]),
+        protein_ok=daily["Protein"] >= PROTEIN_MIN,
+    )
+    grouped = frame.groupby("user_id")
+    metrics = grouped[NUTRIENT_COLUMNS].mean().add_prefix("avg_")
+    metrics.columns = metrics.columns.str.lower()
+    metrics["days_logged"] = grouped.size()
+    metrics["goal_hit_days"] = grouped["hit_goal"].sum().astype(int)
+    metrics["protein_days"] = grouped["protein_ok"].sum().astype(int)
+    metrics["calorie_goal"] = metrics.index.map(goals).fillna(DEFAULT_CALORIE_GOAL).astype(int)
+    metrics["goal_adherence"] = metrics["goal_hit_days"] / metrics["days_logged"]
+    metrics["calorie_band"] = np.select(
+        [metrics["avg_calories"] < metrics["calorie_goal"] * GOAL_BAND[0],
+         metrics["avg_calories"] > metrics["calorie_goal"] * GOAL_BAND[1]],
+        ["low", "high"], "ok")
+    metrics["protein_low"] = metrics["avg_protein"] < PROTEIN_MIN
+    metrics["carbs_low"] = metrics["avg_carbs"] < CARBS_MIN
+    metrics["fat_high"] = metrics["avg_fat"] > FAT_MAX
+    return metrics.join(streaks(daily))
+
+
+def recommendations(metrics: Optional[Dict[str, Any]]) -> List[str]:
+    """Recommendation texts for one user's metrics row (None when they have no data)."""
+    if metrics is None:
+        return ["📋 No data yet. Start logging your meals to receive personalized insights."]
+    recs = []
+    if metrics["calorie_band"] == "low":
+        recs.append("⚡ You're consuming fewer calories than your goal. Try adding healthy calorie-dense foods like nuts, dairy, or whole grains.")
+    elif metrics["calorie_band"] == "high":
+        recs.append("⚠️ You're exceeding your calorie goal. Cut down on sugary drinks and fried snacks.")
+    else:
+        recs.append("✅ Great job! Your calorie intake is well balanced with your goal.")
+    if metrics["protein_low"]:
+        recs.append("🍗 Increase protein — eggs, beans, tofu, or lean meats help.")
+    if metrics["carbs_low"]:
+        recs.append("🥦 Consider more complex carbs (brown rice, oats, vegetables).")
+    if metrics["fat_high"]:
+        recs.append("🧈 Consider reducing saturated fats and fried foods.")
+    return recs
+
+
+def achievements(metrics: Optional[Dict[str, Any]], streak: int) -> List[Dict[str, Any]]:
+    """Achievement cards for one user's metrics row (None when they have no data)."""
+    items = []
+    if metrics is not None:
+        items.append({"title": "🥇 First Log", "description": "You've started your journey — great first step!", "progress": 100, "tier": "bronze"})
+    if streak >= STREAK_TARGET:
+        items.append({"title": "📅 7-Day Streak", "description": "Amazing consistency! You've logged for 7 days straight!", "progress": 100, "tier": "silver"})
+    elif streak > 0:
+        items.append({"title": "📆 Streak in Progress", "description": f"Current streak: {streak} days. Keep it going!", "progress": int(min(100, (streak / STREAK_TARGET) * 100)), "tier": "bronze"})
+    if metrics is None:
+        return items
+
+    hit_goal_days = int(metrics["goal_hit_days"])
+    if hit_goal_days >= GOAL_DAYS_TARGET:
+        items.append({"title": "🎯 Calorie Goal Master", "description": "You've consistently hit your calorie goals this week!", "progress": 100, "tier": "gold"})
+    elif hit_goal_days > 0:
+        items.append({"title": "🎯 Calorie Tracker", "description": f"You hit your calorie goal {hit_goal_days} times this week!", "progress": int(min(100, (hit_goal_days / GOAL_DAYS_TARGET) * 100)), "tier": "bronze"})
+
+    protein_days = int(metrics["protein_days"])
+    if protein_days >= PROTEIN_DAYS_TARGET:
+        items.append({"title": "💪 Protein Pro", "description": "You've reached your protein goal consistently this week!", "progress": 100, "tier": "silver"})
+    elif protein_days > 0:
+        items.append({"title": "💪 Protein Progress", "description": f"Protein goal achieved on {protein_days} days.", "progress": int(min(100, (protein_days / PROTEIN_DAYS_TARGET) * 100)), "tier": "bronze"})
+    return items
+
+
+def load_profiles(conn, user_ids: Optional[List[int]] = None) -> pd.DataFrame:
+    sql = f"SELECT {', '.join(PROFILE_COLUMNS)} FROM users"
+    params: tuple = ()
+    if user_ids is not None:
+        sql += f" WHERE id IN ({', '.join('?' * len(user_ids))})"
+        params = tuple(user_ids)
+    return pd.read_sql_query(sql, conn, params=params).set_index("id")
+
+
+def analyze_user(conn, user_id: int) -> Dict[str, Any]:
+    """
+    Everything the dashboard, analytics and recommendations need for one
+    user, from a single load of their daily series:
+    data (DataFrame), goal, streak, metrics, recommendations, achievements.
+    """
+    data = fetch_past_logs_for_plot(conn, user_id)
+    goal = int(calorie_goals(load_profiles(conn, [user_id])).get(user_id, DEFAULT_CALORIE_GOAL))
+    streak = get_user_streak(conn, user_id)
+    metrics = None
+    if not data.empty:
+        row = compute_metrics(data.assign(user_id=user_id), pd.Series({user_id: goal})).iloc[0]
+        metrics = row.to_dict()
+    return {
+        "data": data,
+        "goal": goal,
+        "streak": streak,
+        "metrics": metrics,
+        "recommendations": recommendations(metrics),
+        "achievements": achievements(metrics, streak),
+    }
+
+
+def analyze_all_users(conn) -> pd.DataFrame:
+    """
+    Metrics for every user with logs, indexed by user_id: averages, goal
+    hits, protein days, adherence, streaks and the rule flags.
+    """
+    daily = pd.read_sql_query(
+        "SELECT user_id, date AS Date, calories AS Calories, carbs AS Carbs, protein AS Protein, fat AS Fat "
+        "FROM daily_totals ORDER BY user_id, date", conn)
+    goals = calorie_goals(load_profiles(conn))
+    if daily.empty:
+        return pd.DataFrame()
+    return compute_metrics(daily, goals)
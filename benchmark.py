@@ -0,0 +1,510 @@
+# benchmark.py
+"""
+Performance benchmarks for NutriAI.
+
+    python benchmark.py queries --sizes 10000 100000 1000000
+    python benchmark.py startup --budget-ms 250
+    python benchmark.py login --threads 1 4 8 --logins 400
+    python benchmark.py server --clients 50 --requests 5000
+    python benchmark.py suite --scales small medium --output bench.json [--compare old.json]
+
+Each benchmark builds throwaway databases in a temp directory; the real
+database files are never touched.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import db
+import utils
+from migrations import MIGRATIONS, migrate
+
+PROBE_DAYS = 365      # history of the user we time queries for
+PROBE_PER_DAY = 4
+PROBE_WATER = 6      # glasses logged today by the probe user
+
+
+def _timeit(fn, repeat: int = 20) -> float:
+    """Median wall time of fn() in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _build_logs_db(path: str, total_rows: int, schema_version: int):
+    """Many background users plus one probe user (id 1) with a fixed history."""
+    conn = sqlite3.connect(path)
+    migrate(conn, [m for m in MIGRATIONS if m[0] <= schema_version])
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    rows = []
+    for d in range(PROBE_DAYS):
+        day = (start + timedelta(days=d)).isoformat()
+        for _ in range(PROBE_PER_DAY):
+            rows.append((1, "apple", 100, 14, 52, 0.3, 0.2, 2.4, day, "Snack"))
+    background_users = max(1, total_rows // 500)
+    for _ in range(max(0, total_rows - len(rows))):
+        day = (start + timedelta(days=rng.randrange(3 * 365))).isoformat()
+        rows.append((rng.randint(2, background_users + 1), "rice", 150, 42, 195, 4, 0.5, 0.6, day, "Lunch"))
+    rng.shuffle(rows)  # interleave users like real traffic
+    conn.executemany(
+        "INSERT INTO food_logs (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("INSERT INTO water_logs (user_id, date, glasses) VALUES (1, date('now'), ?)", (PROBE_WATER,))
+    conn.commit()
+    # derived tables, as far as this schema version has them
+    if schema_version >= 8:
+        db.rebuild_daily_totals(conn)  # also needs users.log_count (v8)
+    else:
+        if schema_version >= 3:
+            conn.execute("""
+                INSERT INTO daily_totals (user_id, date, calories, carbs, protein, fat, fiber, entry_count)
+                SELECT user_id, date, SUM(calories), SUM(carbs), SUM(protein), SUM(fat), SUM(fiber), COUNT(*)
+                FROM food_logs GROUP BY user_id, date""")
+        if schema_version >= 6:
+            conn.execute("INSERT INTO user_streaks (user_id, last_date, current_streak, longest_streak) "
+                         + db.STREAKS_SQL.format(where=""))
+        conn.commit()
+    conn.close()
+
+
+# (column, first schema version with the tables it reads, fn(conn), expected result size)
+QUERY_OPS = [
+    ("view_logs", 1, lambda conn: len(db.view_past_logs(conn, 1)), PROBE_DAYS * PROBE_PER_DAY),
+    ("plot", 3, lambda conn: len(db.fetch_past_logs_for_plot(conn, 1)), PROBE_DAYS),  # daily_totals
+    ("streak", 6, lambda conn: db.get_user_streak(conn, 1), PROBE_DAYS),  # user_streaks
+    ("water", 1, lambda conn: db.get_today_water(conn, 1), PROBE_WATER),
+]
+
+
+def bench_queries(sizes, schema_version: int):
+    """Per-user query latency as the total number of food_logs rows grows."""
+    ops = [op for op in QUERY_OPS if op[1] <= schema_version]
+    skipped = [name for name, since, _, _ in QUERY_OPS if since > schema_version]
+    print(f"schema version {schema_version}; probe user has {PROBE_DAYS * PROBE_PER_DAY} rows")
+    if skipped:
+        print(f"skipped (tables not in this schema): {', '.join(skipped)}")
+    print(f"{'total rows':>12} " + " ".join(f"{name:>10}" for name, *_ in ops) + "  (median ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f"bench_{n}.db")
+            _build_logs_db(path, n, schema_version)
+            conn = sqlite3.connect(path)
+            results = []
+            for name, _, fn, expected in ops:
+                # an empty or short result would time the wrong thing; stop instead
+                got = fn(conn)
+                if got != expected:
+                    conn.close()
+                    raise RuntimeError(f"{name} returned {got} rows/units for the probe user, expected {expected}")
+                results.append(_timeit(lambda: fn(conn)))
+            conn.close()
+            print(f"{n:>12} " + " ".join(f"{r:>10.2f}" for r in results))
+
+
+# Must not be imported before the login screen is up (see ui.py / main.py).
+STARTUP_FORBIDDEN = ("matplotlib", "pandas", "numpy", "rapidfuzz")
+STARTUP_BUDGET_MS = 250.0
+
+
+def _import_profile(module: str):
+    """Run `python -X importtime -c 'import module'`; return {module: cumulative_us}."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=here, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def bench_startup(module: str, budget_ms: float, runs: int) -> bool:
+    """Import cost of the UI entry module; fails over budget or if heavy deps load eagerly."""
+    samples, profile = [], {}
+    for _ in range(runs):
+        profile = _import_profile(module)
+        samples.append(profile[module] / 1000)
+    total = statistics.median(samples)
+    print(f"import {module}: {total:.1f} ms median of {runs} (budget {budget_ms:.0f} ms)")
+    print("slowest imports:")
+    for name, us in sorted(profile.items(), key=lambda kv: kv[1], reverse=True)[1:11]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    eager = sorted({name.split(".")[0] for name in profile} & set(STARTUP_FORBIDDEN))
+    if eager:
+        print(f"FAIL: loaded at startup: {', '.join(eager)}")
+        ok = False
+    if total > budget_ms:
+        print(f"FAIL: {total:.1f} ms exceeds the {budget_ms:.0f} ms budget")
+        ok = False
+    return ok
+
+
+def _build_users_db(path: str, users: int):
+    """`users` accounts named user0..userN, all with password "secret"."""
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    # one KDF run for every account: building the fixture should not take minutes
+    salt = utils.generate_salt()
+    pwd_hash, salt_hex = utils.hash_password("secret", salt)
+    conn.executemany("INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)",
+                     [(f"user{i}", pwd_hash, salt_hex) for i in range(users)])
+    conn.commit()
+    conn.close()
+
+
+def _login_storm(path: str, users: int, threads: int, logins: int):
+    """Run `logins` logins over `threads` threads; returns (logins/s, p50 ms, p99 ms)."""
+    local = threading.local()
+
+    def login(i):
+        if not hasattr(local, "conn"):
+            local.conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        if db.login_user(local.conn, f"user{i % users}", "secret") is None:
+            raise RuntimeError("login failed")
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = sorted(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    return logins / elapsed, samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def bench_login(users: int, thread_counts, logins: int):
+    """Login throughput and latency under concurrency, with and without the verify cache."""
+    algorithm, params = utils.current_hash_params()
+    start = time.perf_counter()
+    utils.hash_password("secret", utils.generate_salt())
+    print(f"hash: {algorithm} {params}, {(time.perf_counter() - start) * 1000:.1f} ms per hash")
+    print(f"{users} users, {logins} logins per run, {os.cpu_count()} CPUs")
+    print(f"{'threads':>8} {'cache':>6} {'logins/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    ttl = utils.verify_cache.ttl
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_login.db")
+        _build_users_db(path, users)
+        try:
+            for threads in thread_counts:
+                for cache_ttl in (0, ttl or 300):
+                    utils.verify_cache.ttl = cache_ttl
+                    utils.verify_cache.clear()
+                    rate, p50, p99 = _login_storm(path, users, threads, logins)
+                    print(f"{threads:>8} {'on' if cache_ttl else 'off':>6} {rate:>10.1f} {p50:>9.2f} {p99:>9.2f}")
+        finally:
+            utils.verify_cache.ttl = ttl
+            utils.verify_cache.clear()
+
+
+# (weight, method, path, body) for one simulated mobile client request
+SERVER_MIX = [
+    (40, "GET", "/logs?limit=50", None),
+    (20, "POST", "/logs", {"food_name": "apple", "quantity": 150, "meal_type": "Snack"}),
+    (15, "GET", "/streak", None),
+    (15, "GET", "/goal", None),
+    (10, "GET", "/plot", None),
+]
+
+
+async def _http(reader, writer, method: str, path: str, body=None, token: str = None):
+    """One keep-alive HTTP/1.1 request; returns (status, json payload)."""
+    data = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _drive_server(port: int, users: int, clients: int, requests: int):
+    """`clients` connections sharing `requests` requests; returns {endpoint: [ms, ...]}, errors, seconds."""
+    rng = random.Random(7)
+    weights = [w for w, *_ in SERVER_MIX]
+    samples = {f"{m} {p.split('?')[0]}": [] for _, m, p, _ in SERVER_MIX}
+    samples["POST /login"] = []
+    errors = 0
+    remaining = requests
+
+    async def client(n):
+        nonlocal remaining, errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        start = time.perf_counter()
+        status, payload = await _http(reader, writer, "POST", "/login",
+                                      {"username": f"user{n % users}", "password": "secret"})
+        samples["POST /login"].append((time.perf_counter() - start) * 1000)
+        token = payload.get("token")
+        while remaining > 0 and token:
+            remaining -= 1
+            _, method, path, body = rng.choices(SERVER_MIX, weights)[0]
+            start = time.perf_counter()
+            status, _ = await _http(reader, writer, method, path, body, token)
+            samples[f"{method} {path.split('?')[0]}"].append((time.perf_counter() - start) * 1000)
+            errors += status != 200
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    return samples, errors, time.perf_counter() - start
+
+
+def _percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def bench_server(users: int, clients: int, requests: int, workers: int, max_concurrent: int,
+                 write_behind: bool = False):
+    """Start server.py on a throwaway database and load it with local keep-alive clients."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_server.db")
+        _build_users_db(path, users)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(here, "server.py"), "--db", path,
+             "--catalog-db", os.path.join(tmp, "catalog.db"), "--port", str(port),
+             "--workers", str(workers), "--max-concurrent", str(max_concurrent)]
+            + (["--write-behind"] if write_behind else []),
+            cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    break
+                except OSError:
+                    if proc.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("server did not start")
+                    time.sleep(0.1)
+            samples, errors, elapsed = asyncio.run(_drive_server(port, users, clients, requests))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    total = sum(len(v) for v in samples.values())
+    print(f"{clients} clients, {total} requests in {elapsed:.1f}s ({total / elapsed:.0f} req/s), {errors} errors")
+    print(f"{'endpoint':<14} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, values in samples.items():
+        if values:
+            print(f"{name:<14} {len(values):>7} {_percentile(values, 0.5):>9.2f} {_percentile(values, 0.99):>9.2f}")
+    everything = [v for values in samples.values() for v in values]
+    print(f"{'all':<14} {len(everything):>7} {_percentile(everything, 0.5):>9.2f} {_percentile(everything, 0.99):>9.2f}")
+
+
+# synthetic.generate() arguments per scale
+SUITE_SCALES = {
+    "small": {"users": 100, "logs": 20_000, "foods": 1_000},
+    "medium": {"users": 1_000, "logs": 200_000, "foods": 10_000},
+    "large": {"users": 10_000, "logs": 1_000_000, "foods": 50_000},
+}
+SUITE_END = date(2024, 12, 31)   # fixed so every run builds identical data
+SUITE_SEED = 42
+SUITE_PROBES = 20                # users each per-user operation is timed on
+SEARCH_TERMS = ["apple", "chick", "grilled rice", "brocoli", "bagel", "low fat milk", "tofu", "pizz"]
+NOISE_FLOOR_MS = 0.5             # ignore regressions smaller than this
+
+
+def _summary(samples) -> dict:
+    ordered = sorted(samples)
+    return {"n": len(ordered), "median_ms": round(statistics.median(ordered), 4),
+            "p90_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 4),
+            "min_ms": round(ordered[0], 4)}
+
+
+def _time_each(fn, args_list) -> dict:
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return _summary(samples)
+
+
+def _git_commit() -> str:
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True, text=True)
+    return proc.stdout.strip() or "unknown"
+
+
+def run_suite_scale(tmp: str, name: str, params: dict) -> dict:
+    """Build one synthetic scale and time every hot path on it."""
+    import nutrition
+    import synthetic
+    from food_search import get_search_index
+    from usda_api import USDANutritionAPI
+
+    path = os.path.join(tmp, f"suite_{name}.db")
+    catalog_path = os.path.join(tmp, f"suite_{name}_catalog.db")
+    start = time.perf_counter()
+    synthetic.generate(path, catalog_path, end=SUITE_END, seed=SUITE_SEED, days=365, **params)
+    generate_s = time.perf_counter() - start
+
+    conn = db.connect_to_db(path)
+    rng = random.Random(SUITE_SEED)
+    probes = rng.sample(range(1, params["users"] + 1), min(SUITE_PROBES, params["users"]))
+    probe_args = [(conn, uid) for uid in probes]
+    api = USDANutritionAPI(catalog_path)
+    foods = [row[0] for row in sqlite3.connect(catalog_path).execute("SELECT name FROM foods LIMIT 200")]
+    index = get_search_index(catalog_path)
+
+    ops = {}
+    ops["log_food"] = _time_each(nutrition.log_food, [
+        (conn, uid, foods[i % len(foods)], 150, SUITE_END.isoformat(), "Lunch", api)
+        for i, uid in enumerate(probes * 5)])
+    ops["view_past_logs"] = _time_each(db.view_past_logs, probe_args)
+    ops["view_past_logs_page"] = _time_each(db.view_past_logs_page, probe_args)
+    ops["fetch_past_logs_for_plot"] = _time_each(db.fetch_past_logs_for_plot, probe_args)
+    ops["get_user_streak"] = _time_each(db.get_user_streak, probe_args)
+    ops["get_users_page"] = _time_each(db.get_users_page, [
+        (conn, 200, None, sort, sort != "username") for sort in db.USER_SORTS] * 3)
+    ops["search_index_build"] = _time_each(index.search, [("warmup", 8)])
+    ops["search_foods"] = _time_each(index.search, [(term, 8) for term in SEARCH_TERMS * 3])
+
+    ttl = utils.verify_cache.ttl
+    utils.verify_cache.ttl = 0  # time the KDF, not the cache
+    try:
+        ops["login_user"] = _time_each(db.login_user, [
+            (conn, f"user{uid - 1}", synthetic.SYNTHETIC_PASSWORD) for uid in probes[:5]])
+    finally:
+        utils.verify_cache.ttl = ttl
+    # destructive, so last
+    ops["delete_user"] = _time_each(db.delete_user, [(conn, uid) for uid in probes[:5]])
+
+    counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("users", "food_logs", "water_logs")}
+    return {"params": params, "rows": counts, "generate_s": round(generate_s, 2), "ops": ops}
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float) -> list:
+    """(scale, op, old_ms, new_ms) for medians that got more than `tolerance` times slower."""
+    regressions = []
+    for scale, result in current["scales"].items():
+        old_ops = baseline.get("scales", {}).get(scale, {}).get("ops", {})
+        for op, stats in result["ops"].items():
+            if op not in old_ops:
+                continue
+            old, new = old_ops[op]["median_ms"], stats["median_ms"]
+            if new > old * tolerance and new - old > NOISE_FLOOR_MS:
+                regressions.append((scale, op, old, new))
+    return regressions
+
+
+def bench_suite(scales, output: str = None, compare: str = None, tolerance: float = 1.5) -> bool:
+    """End-to-end timings of the db/nutrition/search hot paths on synthetic data, as JSON."""
+    results = {
+        "meta": {"commit": _git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "seed": SUITE_SEED},
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in scales:
+            print(f"[{name}] generating {SUITE_SCALES[name]} ...", file=sys.stderr)
+            results["scales"][name] = run_suite_scale(tmp, name, SUITE_SCALES[name])
+            for op, stats in results["scales"][name]["ops"].items():
+                print(f"[{name}] {op:<26} median {stats['median_ms']:>9.3f} ms  p90 {stats['p90_ms']:>9.3f} ms",
+                      file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if compare:
+        with open(compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, tolerance)
+        base_commit = baseline.get("meta", {}).get("commit", "?")
+        for scale, op, old, new in regressions:
+            print(f"REGRESSION [{scale}] {op}: {old:.3f} -> {new:.3f} ms ({new / old:.1f}x vs {base_commit})",
+                  file=sys.stderr)
+        if not regressions:
+            print(f"No regressions vs {base_commit} (tolerance {tolerance}x)", file=sys.stderr)
+        return not regressions
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriAI performance benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    q = sub.add_parser("queries", help="per-user query latency vs. table size")
+    q.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    q.add_argument("--schema-version", type=int, default=MIGRATIONS[-1][0],
+                   help="migrate only up to this version (1 = no indexes)")
+
+    st = sub.add_parser("startup", help="import time of the UI, with a regression budget")
+    st.add_argument("--module", default="ui")
+    st.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    st.add_argument("--runs", type=int, default=5)
+
+    lg = sub.add_parser("login", help="login throughput under concurrency")
+    lg.add_argument("--users", type=int, default=100)
+    lg.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    lg.add_argument("--logins", type=int, default=400)
+
+    sv = sub.add_parser("server", help="p50/p99 latency of server.py under local client load")
+    sv.add_argument("--users", type=int, default=20)
+    sv.add_argument("--clients", type=int, default=50)
+    sv.add_argument("--requests", type=int, default=5000)
+    sv.add_argument("--workers", type=int, default=8)
+    sv.add_argument("--max-concurrent", type=int, default=64)
+    sv.add_argument("--write-behind", action="store_true", help="start the server with --write-behind")
+
+    su = sub.add_parser("suite", help="hot-path timings on synthetic data, as JSON")
+    su.add_argument("--scales", nargs="+", choices=list(SUITE_SCALES), default=["small", "medium"])
+    su.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    su.add_argument("--compare", default=None, metavar="BASELINE_JSON",
+                    help="exit 1 if a median got slower than --tolerance times the baseline")
+    su.add_argument("--tolerance", type=float, default=1.5)
+
+    args = parser.parse_args()
+    if args.command == "queries":
+        bench_queries(args.sizes, args.schema_version)
+    elif args.command == "startup":
+        sys.exit(0 if bench_startup(args.module, args.budget_ms, args.runs) else 1)
+    elif args.command == "login":
+        bench_login(args.users, args.threads, args.logins)
+    elif args.command == "server":
+        bench_server(args.users, args.clients, args.requests, args.workers, args.max_concurrent, args.write_behind)
+    elif args.command == "suite":
+        sys.exit(0 if bench_suite(args.scales, args.output, args.compare, args.tolerance) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# charts.py
+"""
+Chart rendering for the analytics dashboard.
+
+Figures are built with the object-oriented matplotlib API (Figure +
+FigureCanvasAgg), never through pyplot, so nothing is registered in
+pyplot's global figure manager and rendering is safe off the Tk thread.
+Each chart is rendered to PNG bytes and the Figure is cleared right away;
+the PNG is cached by (user, data version, chart type, size) so reopening
+the dashboard on unchanged data shows the cached image without rendering.
+"""
+import hashlib
+import io
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache import LRUCache
+from constant import COLORS
+
+CHART_CACHE_ITEMS = 64
+CHART_CACHE_BYTES = 16 * 1024 * 1024
+DPI = 100
+
+Size = Tuple[int, int]  # pixels
+
+
+class ChartUnavailable(Exception):
+    """The data cannot produce this chart; the message is shown instead of it."""
+
+
+BUCKET_TITLES = {"day": "", "week": " (weekly average)", "month": " (monthly average)"}
+
+
+def _bar_width(dates) -> float:
+    """Bar width in days: 80% of the smallest gap, so week/month buckets get wide bars."""
+    import numpy as np
+    if len(dates) < 2:
+        return 0.8
+    days = np.diff(np.asarray(dates, dtype="datetime64[D]").astype(np.int64))
+    return 0.8 * max(1, int(days.min()))
+
+
+def _bar_with_goal(fig, data, goal, bucket="day", **_):
+    ax = fig.add_subplot()
+    ax.bar(data["Date"], data["Calories"], width=_bar_width(data["Date"]),
+           color=COLORS.get('secondary', '#66BB6A'), label="Consumed")
+    ax.axhline(y=goal, color="red", linestyle="--", label="Goal")
+    ax.set_title("Calories vs Goal" + BUCKET_TITLES.get(bucket, ""))
+    fig.autofmt_xdate()
+    ax.set_ylabel("Calories")
+    ax.legend()
+
+
+def _macro_pie(fig, data, **_):
+    if data.empty:
+        raise ChartUnavailable("Insufficient data for pie chart.")
+    last_day = data.iloc[-1]
+    macros = [last_day["Carbs"], last_day["Protein"], last_day["Fat"]]
+    if not sum(macros) > 0:
+        raise ChartUnavailable("Insufficient data for pie chart.")
+    ax = fig.add_subplot()
+    ax.pie(macros, labels=["Carbs", "Protein", "Fat"], autopct="%1.1f%%", startangle=90,
+           colors=["#42A5F5", "#66BB6A", "#FFA726"])
+    ax.set_title(f"Macronutrient Breakdown ({last_day['Date']})")
+
+
+def _weight_progress(fig, data, weight=None, goal_weight=None, **_):
+    if weight is None:
+        raise ChartUnavailable("No weight data available.")
+    ax = fig.add_subplot()
+    ax.plot(data["Date"], [weight] * len(data), label="Current Weight", marker="o")
+    if goal_weight is not None:
+        ax.axhline(y=goal_weight, color="green", linestyle="--", label="Goal Weight")
+    ax.set_title("Weight Progress")
+    ax.legend()
+
+
+def _weekly_trends(fig, data, **_):
+    weekly = data.tail(7)
+    if weekly.empty:
+        raise ChartUnavailable("No weekly data available.")
+    ax = fig.add_subplot()
+    ax.bar(weekly["Date"], weekly["Calories"], color="#42A5F5", alpha=0.7, label="Calories")
+    ax.plot(weekly["Date"], weekly["Protein"], marker="o", color="#66BB6A", label="Protein")
+    ax.plot(weekly["Date"], weekly["Carbs"], marker="s", color="#FFA726", label="Carbs")
+    ax.plot(weekly["Date"], weekly["Fat"], marker="^", color="#EF5350", label="Fat")
+    ax.set_title("Last 7 Days: Calories & Macronutrients")
+    ax.legend()
+
+
+CHARTS: Dict[str, Callable] = {
+    "calories": _bar_with_goal,
+    "macros": _macro_pie,
+    "weight": _weight_progress,
+    "weekly": _weekly_trends,
+}
+
+
+def data_version(data, params: Dict[str, Any]) -> str:
+    """Digest of everything a chart is drawn from: the daily frame plus chart params."""
+    import pandas as pd
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+class ChartService:
+    def __init__(self, max_items: int = CHART_CACHE_ITEMS, max_bytes: int = CHART_CACHE_BYTES):
+        self.cache = LRUCache(max_items=max_items, max_bytes=max_bytes)
+        # matplotlib's font and text caches are not thread-safe; one render at a time
+        self._render_lock = threading.Lock()
+
+    def render(self, user_id: int, kind: str, data, size: Size, **params) -> bytes:
+        """
+        PNG bytes of chart `kind` for `data` (the frame from
+        fetch_past_logs_for_plot) at `size` pixels. Served from the cache
+        when the same user, data, chart and size were rendered before.
+        Raises ChartUnavailable when there is nothing to draw.
+        """
+        key = (user_id, data_version(data, params), kind, tuple(size))
+        png = self.cache.get(key)
+        if png is None:
+            png = self._draw(CHARTS[kind], data, size, params)
+            self.cache.put(key, png)
+        return png
+
+    def _draw(self, builder: Callable, data, size: Size, params: Dict[str, Any]) -> bytes:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        with self._render_lock:
+            fig = Figure(figsize=(size[0] / DPI, size[1] / DPI), dpi=DPI)
+            try:
+                FigureCanvasAgg(fig)
+                builder(fig, data, **params)
+                fig.tight_layout()
+                buf = io.BytesIO()
+                fig.savefig(buf, format="png")
+                return buf.getvalue()
+            finally:
+                fig.clear()  # drop artists now rather than waiting for the GC
+
+    def invalidate_user(self, user_id: int) -> int:
+        return self.cache.invalidate(lambda key: key[0] == user_id)
+
+
+_service: Optional[ChartService] = None
+_service_lock = threading.Lock()
+
+
+def get_chart_service() -> ChartService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ChartService()
+        return _service
@@ -11,9 +11,30 @@ COLORS = {
 }
 
 # Password hashing config
+# Hashes are stored as "<algorithm>$<params>$<hex digest>"; rows with a bare
+# hex digest predate this and are PBKDF2-SHA256 at 150k iterations. Changing
+# these settings re-hashes each user on their next successful login.
+PWD_HASH_ALGORITHM = "pbkdf2_sha256"   # or "scrypt"
 PWD_HASH_ITERATIONS = 150_000
 PWD_HASH_NAME = "sha256"
 PWD_SALT_BYTES = 16
+# If set, PBKDF2 iterations are calibrated on first use so one hash takes
+# about this many milliseconds on this machine (never below the minimum).
+PWD_HASH_TARGET_MS = None
+PWD_HASH_MIN_ITERATIONS = 100_000
+PWD_SCRYPT_N = 2 ** 14
+PWD_SCRYPT_R = 8
+PWD_SCRYPT_P = 1
+# Recently verified logins skip the KDF for this long (0 disables the cache)
+PWD_VERIFY_CACHE_TTL = 300
+PWD_VERIFY_CACHE_SIZE = 1024
 
 # Database file
 DB_FILE = "database/nutrition_tracker.db"
+
+# Local nutrition catalog (foods table, values per 100 g)
+NUTRITION_DB_FILE = "database/nutrition_local.db"
+
+# Queue food logs from the app through write_behind.py (group commit by one
+# writer thread) instead of committing each entry; flushed on exit
+LOG_WRITE_BEHIND = False
@@ -1,61 +1,34 @@
 # db.py
+import logging
 import sqlite3
+import sys
 from sqlite3 import Connection
 from typing import Optional, Tuple, List
-from constant import DB_FILE
-from utils import generate_salt, hash_password, verify_password
+from constant import DB_FILE, NUTRITION_DB_FILE
+from db_pool import get_pool
+from food_catalog import get_catalog, normalize_name
+from instrumentation import instrument_module
+from migrations import migrate
+from purge import purge_user
+from utils import generate_salt, hash_password, needs_rehash, verify_password
+
+logger = logging.getLogger("NutriAI.DB")
 
 def connect_to_db(db_file: str = DB_FILE) -> Connection:
-    conn = sqlite3.connect(db_file, check_same_thread=False)
-    cursor = conn.cursor()
-    
-
-    # Create users table (new schema) if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        salt TEXT NOT NULL,
-        age INTEGER,
-        gender TEXT,
-        height REAL,
-        weight REAL,
-        goal_weight REAL,
-        activity_level TEXT,
-        weight_goal TEXT,
-        is_admin INTEGER DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-
-    # Create food_logs table if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS food_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        food_name TEXT NOT NULL,
-        quantity REAL NOT NULL,
-        carbs REAL,
-        calories REAL,
-        protein REAL,
-        fat REAL,
-        fiber REAL,
-        date DATE NOT NULL,
-        meal_type TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS water_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            date TEXT,
-            glasses INTEGER DEFAULT 0,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )""")
+    """
+    Return the calling thread's pooled connection to the tracker DB.
+    Schema migrations run once per process, on the first connection.
+    """
+    return get_pool(db_file, migrate).thread_connection()
 
-    conn.commit()
-    return conn
+
+def borrow_connection(db_file: str = DB_FILE):
+    """
+    `with borrow_connection() as conn:` a pooled connection for one unit of
+    work, returned on exit. Worker threads use this so they don't each keep
+    a pool slot for their whole life.
+    """
+    return get_pool(db_file, migrate).connection()
 
 # User functions
 def create_user(conn: Connection, username: str, password: str,is_admin: bool = False) -> bool:
@@ -82,8 +55,25 @@ def login_user(conn: Connection, username: str, password: str) -> Optional[Tuple
         return None
     user_id, stored_hash, stored_salt,is_admin = row
     if verify_password(password, stored_hash, stored_salt):
+        if needs_rehash(stored_hash):
+            _rehash_password(conn, user_id, password, stored_hash)
         return (user_id, username, bool(is_admin))
     return None
+
+def _rehash_password(conn: Connection, user_id: int, password: str, old_hash: str):
+    """
+    Upgrade a verified user's hash to the current algorithm/cost. Only
+    replaces the hash that was verified, so a concurrent password reset wins.
+    """
+    new_hash, salt_hex = hash_password(password, generate_salt())
+    try:
+        conn.execute("UPDATE users SET password_hash=?, salt=? WHERE id=? AND password_hash=?",
+                     (new_hash, salt_hex, user_id, old_hash))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.warning("Could not upgrade password hash for user %s: %s", user_id, e)
+
 def update_user_profile(conn: Connection, user_id: int, age, gender, height, weight, goal_weight, activity_level, weight_goal):
     cursor = conn.cursor()
     cursor.execute(
@@ -112,16 +102,149 @@ def get_user_data_for_ml(conn: Connection, user_id: int):
         }
     return None
 
+# Daily totals (rollup of food_logs per user and date)
+DAILY_TOTALS_UPSERT = """
+    INSERT INTO daily_totals (user_id, date, calories, carbs, protein, fat, fiber, entry_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, date) DO UPDATE SET
+        calories = calories + excluded.calories,
+        carbs = carbs + excluded.carbs,
+        protein = protein + excluded.protein,
+        fat = fat + excluded.fat,
+        fiber = fiber + excluded.fiber,
+        entry_count = entry_count + excluded.entry_count
+"""
+
+USER_SUMMARY_BUMP = "UPDATE users SET log_count = log_count + ?, last_log_date = MAX(last_log_date, ?) WHERE id = ?"
+
+USER_SUMMARY_REFRESH = """
+    UPDATE users SET
+        log_count = COALESCE((SELECT SUM(entry_count) FROM daily_totals WHERE user_id = users.id), 0),
+        last_log_date = COALESCE((SELECT MAX(date) FROM daily_totals WHERE user_id = users.id), '')
+"""
+
+def _add_to_daily_totals(cursor, rows: List[tuple]):
+    """
+    Fold food_logs rows (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type)
+    into daily_totals and the users.log_count / last_log_date summary. Runs
+    inside the caller's transaction.
+    """
+    totals = {}
+    summary = {}
+    for user_id, _, _, carbs, calories, protein, fat, fiber, date, _ in rows:
+        t = totals.setdefault((user_id, date), [0.0, 0.0, 0.0, 0.0, 0.0, 0])
+        t[0] += calories or 0
+        t[1] += carbs or 0
+        t[2] += protein or 0
+        t[3] += fat or 0
+        t[4] += fiber or 0
+        t[5] += 1
+        count, last = summary.get(user_id, (0, ""))
+        summary[user_id] = (count + 1, max(last, str(date)))
+    cursor.executemany(DAILY_TOTALS_UPSERT, [(u, d, *t) for (u, d), t in totals.items()])
+    cursor.executemany(USER_SUMMARY_BUMP, [(count, last, u) for u, (count, last) in summary.items()])
+
+def rebuild_daily_totals(conn: Connection, user_id: Optional[int] = None):
+    """Recompute daily_totals (and the streaks and user summary derived from it) from food_logs, for one user or everyone."""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("WHERE user_id IS NOT NULL", ())
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DELETE FROM daily_totals {'WHERE user_id = ?' if user_id is not None else ''}", params)
+        cur.execute(f"""
+            INSERT INTO daily_totals (user_id, date, calories, carbs, protein, fat, fiber, entry_count)
+            SELECT user_id, date, COALESCE(SUM(calories), 0), COALESCE(SUM(carbs), 0),
+                   COALESCE(SUM(protein), 0), COALESCE(SUM(fat), 0), COALESCE(SUM(fiber), 0), COUNT(*)
+            FROM food_logs {where}
+            GROUP BY user_id, date
+        """, params)
+        cur.execute(USER_SUMMARY_REFRESH + ("WHERE id = ?" if user_id is not None else ""), params)
+        if user_id is not None:
+            _refresh_streak(cur, user_id)
+        else:
+            cur.execute("DELETE FROM user_streaks")
+            cur.execute("INSERT INTO user_streaks (user_id, last_date, current_streak, longest_streak) "
+                        + STREAKS_SQL.format(where=""))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def verify_daily_totals(conn: Connection, user_id: Optional[int] = None) -> List[Tuple[int, str]]:
+    """Return (user_id, date) pairs where daily_totals disagrees with food_logs."""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("WHERE user_id IS NOT NULL", ())
+    expected = f"""
+        SELECT user_id, date, ROUND(COALESCE(SUM(calories), 0), 4), ROUND(COALESCE(SUM(carbs), 0), 4),
+               ROUND(COALESCE(SUM(protein), 0), 4), ROUND(COALESCE(SUM(fat), 0), 4),
+               ROUND(COALESCE(SUM(fiber), 0), 4), COUNT(*)
+        FROM food_logs {where} GROUP BY user_id, date
+    """
+    actual = f"""
+        SELECT user_id, date, ROUND(calories, 4), ROUND(carbs, 4), ROUND(protein, 4),
+               ROUND(fat, 4), ROUND(fiber, 4), entry_count
+        FROM daily_totals {where}
+    """
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT DISTINCT user_id, date FROM (
+            SELECT * FROM ({expected}) EXCEPT SELECT * FROM ({actual})
+            UNION ALL
+            SELECT * FROM ({actual}) EXCEPT SELECT * FROM ({expected})
+        ) ORDER BY user_id, date
+    """, params * 4)
+    return cur.fetchall()
+
 # Food logs
+FOOD_LOG_INSERT = "INSERT INTO food_logs (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
 def log_food_db(conn: Connection, user_id: int, food_name: str, quantity: float, carbs, calories, protein, fat, fiber, date, meal_type):
     cursor = conn.cursor()
-    print("DEBUG insert values:", carbs, calories, protein, fat, fiber)
-    cursor.execute(
-        "INSERT INTO food_logs (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type)
-    )
-    conn.commit()
-    return cursor.lastrowid
+    logger.debug("insert values: carbs=%s calories=%s protein=%s fat=%s fiber=%s", carbs, calories, protein, fat, fiber)
+    row = (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type)
+    try:
+        cursor.execute(FOOD_LOG_INSERT, row)
+        row_id = cursor.lastrowid
+        _add_to_daily_totals(cursor, [row])
+        _advance_streaks(cursor, [row])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return row_id
+
+def log_foods_batch_db(conn: Connection, rows: List[tuple]) -> List[int]:
+    """
+    Insert many food_logs rows in one transaction.
+    Each row is (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type).
+    Returns the new row ids in input order. Inside a caller's transaction
+    the rows join it (under a savepoint) and committing is left to the caller.
+    """
+    if not rows:
+        return []
+    cursor = conn.cursor()
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        # take the write lock up front so the AUTOINCREMENT ids are contiguous
+        cursor.execute("BEGIN IMMEDIATE")
+    else:
+        cursor.execute("SAVEPOINT log_foods_batch")
+    try:
+        cursor.executemany(FOOD_LOG_INSERT, rows)
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        _add_to_daily_totals(cursor, rows)
+        _advance_streaks(cursor, rows)
+        if own_transaction:
+            conn.commit()
+        else:
+            cursor.execute("RELEASE log_foods_batch")
+    except Exception:
+        if own_transaction:
+            conn.rollback()
+        else:
+            # undo only this batch; the caller's earlier work stays pending
+            cursor.execute("ROLLBACK TO log_foods_batch")
+            cursor.execute("RELEASE log_foods_batch")
+        raise
+    return list(range(last_id - len(rows) + 1, last_id + 1))
 
 def view_past_logs(conn: Connection, user_id: int):
     cursor = conn.cursor()
@@ -131,23 +254,54 @@ def view_past_logs(conn: Connection, user_id: int):
     )
     return cursor.fetchall()
 
-# db.py
-import pandas as pd
+LogCursor = Tuple[str, int]  # (date, id) of the last row on a page
+
+def view_past_logs_page(conn: Connection, user_id: int, limit: int = 200, after: Optional[LogCursor] = None,
+                        start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        meal_type: Optional[str] = None) -> Tuple[List[tuple], Optional[LogCursor]]:
+    """
+    One page of a user's logs, newest first, same columns as view_past_logs.
+    Pass the returned cursor as `after` to get the next page; it is None on
+    the last page. Dates are inclusive YYYY-MM-DD bounds.
+    """
+    clauses, params = ["user_id = ?"], [user_id]
+    if after is not None:
+        # the plain range lets sqlite seek straight to the cursor in the index
+        clauses.append("date <= ? AND (date < ? OR id < ?)")
+        params += [after[0], after[0], after[1]]
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("date <= ?")
+        params.append(end_date)
+    if meal_type:
+        clauses.append("meal_type = ?")
+        params.append(meal_type)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT date, food_name, quantity, carbs, calories, protein, fat, id
+            FROM food_logs INDEXED BY idx_food_logs_user_day
+            WHERE {' AND '.join(clauses)}
+            ORDER BY date DESC, id DESC LIMIT ?""",
+        (*params, limit + 1)
+    )
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = (rows[-1][0], rows[-1][-1]) if has_more else None
+    return [row[:-1] for row in rows], next_cursor
 
 def fetch_past_logs_for_plot(conn, user_id):
     """Fetch data for visualization: returns DataFrame with Date, Carbs, Calories, Protein, Fat"""
+    import pandas as pd  # heavy; only needed once charts or analytics are opened
     try:
         cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT date,
-                   COALESCE(SUM(carbs), 0)   AS Carbs,
-                   COALESCE(SUM(calories), 0) AS Calories,
-                   COALESCE(SUM(protein), 0) AS Protein,
-                   COALESCE(SUM(fat), 0) AS Fat
-            FROM food_logs
+            SELECT date, carbs AS Carbs, calories AS Calories, protein AS Protein, fat AS Fat
+            FROM daily_totals
             WHERE user_id = ?
-            GROUP BY date
             ORDER BY date
             """,
             (user_id,)
@@ -163,9 +317,48 @@ def fetch_past_logs_for_plot(conn, user_id):
         df[['Carbs', 'Calories', 'Protein', 'Fat']] = df[['Carbs', 'Calories', 'Protein', 'Fat']].apply(pd.to_numeric, errors='coerce').fillna(0)
         return df
     except Exception as e:
-        print(f"Error fetching data for plots: {e}")
+        logger.error("Error fetching data for plots: %s", e)
         return pd.DataFrame(columns=["Date", "Carbs", "Calories", "Protein", "Fat"])
 
+# sqlite expression for the first day of each bucket
+BUCKET_SQL = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",   # Monday of that week
+    "month": "strftime('%Y-%m-01', date)",
+}
+
+def get_log_date_range(conn, user_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """First and last day with logs for a user, or (None, None)."""
+    row = conn.execute("SELECT MIN(date), MAX(date) FROM daily_totals WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0], row[1]
+
+def fetch_bucketed_totals(conn, user_id: int, bucket: str = "day", start_date: Optional[str] = None,
+                          end_date: Optional[str] = None):
+    """
+    Like fetch_past_logs_for_plot, but grouped into day/week/month buckets
+    in SQL. Values are averages over the logged days in each bucket, so they
+    stay comparable with a daily goal; Date is the bucket's first day.
+    """
+    import pandas as pd
+    columns = ["Date", "Carbs", "Calories", "Protein", "Fat"]
+    clauses, params = ["user_id = ?"], [user_id]
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("date <= ?")
+        params.append(end_date)
+    bucket_expr = BUCKET_SQL[bucket]
+    rows = conn.execute(
+        f"""SELECT {bucket_expr} AS bucket, AVG(carbs), AVG(calories), AVG(protein), AVG(fat)
+            FROM daily_totals
+            WHERE {' AND '.join(clauses)}
+            GROUP BY bucket ORDER BY bucket""",
+        params).fetchall()
+    df = pd.DataFrame(rows, columns=columns)
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    return df
+
 def get_all_users(conn):
     """
     Fetch all users from the database.
@@ -176,6 +369,63 @@ def get_all_users(conn):
         FROM users
     """)
     return cur.fetchall()
+
+# sort key -> users column; each has an index (see migration 8)
+USER_SORTS = {"id": "id", "username": "username", "created": "created_at",
+              "logs": "log_count", "last_log": "last_log_date"}
+USER_DIRECTORY_COLUMNS = "id, username, age, gender, activity_level, weight_goal, log_count, last_log_date, created_at, is_admin"
+UserCursor = Tuple[object, int]  # (sort value, id) of the last row on a page
+
+def get_users_page(conn: Connection, limit: int = 200, after: Optional[UserCursor] = None, sort: str = "id",
+                   descending: bool = False, username_prefix: Optional[str] = None, is_admin: Optional[bool] = None,
+                   activity_level: Optional[str] = None, created_from: Optional[str] = None,
+                   created_to: Optional[str] = None) -> Tuple[List[tuple], Optional[UserCursor]]:
+    """
+    One page of the admin user directory (USER_DIRECTORY_COLUMNS), ordered by
+    USER_SORTS[sort] then id. Pass the returned cursor as `after` for the
+    next page; it is None on the last page. created_* are inclusive
+    YYYY-MM-DD bounds.
+    """
+    if sort not in USER_SORTS:
+        raise ValueError(f"Unknown sort '{sort}' (expected one of {', '.join(USER_SORTS)})")
+    column = USER_SORTS[sort]
+    op, direction = ("<", "DESC") if descending else (">", "ASC")
+    clauses, params = [], []
+    if after is not None:
+        if column == "id":
+            clauses.append(f"id {op} ?")
+            params.append(after[1])
+        else:
+            # plain range first so sqlite seeks straight to the cursor in the index
+            clauses.append(f"{column} {op}= ? AND ({column} {op} ? OR id {op} ?)")
+            params += [after[0], after[0], after[1]]
+    if username_prefix:
+        # a range rather than LIKE, so the (case-sensitive) unique index is used
+        clauses.append("username >= ? AND username < ?")
+        params += [username_prefix, username_prefix[:-1] + chr(ord(username_prefix[-1]) + 1)]
+    if is_admin is not None:
+        clauses.append("is_admin = ?")
+        params.append(1 if is_admin else 0)
+    if activity_level:
+        clauses.append("activity_level = ?")
+        params.append(activity_level)
+    if created_from:
+        clauses.append("created_at >= ?")
+        params.append(created_from)
+    if created_to:
+        clauses.append("created_at < date(?, '+1 day')")
+        params.append(created_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = f"id {direction}" if column == "id" else f"{column} {direction}, id {direction}"
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {USER_DIRECTORY_COLUMNS} FROM users {where} ORDER BY {order} LIMIT ?", (*params, limit + 1))
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    index = USER_DIRECTORY_COLUMNS.split(", ").index(column)
+    next_cursor = (rows[-1][index], rows[-1][0]) if has_more else None
+    return rows, next_cursor
+
 def set_admin_status(conn, user_id: int, is_admin: bool):
     cur = conn.cursor()
     cur.execute("UPDATE users SET is_admin=? WHERE id=?", (1 if is_admin else 0, user_id))
@@ -191,11 +441,23 @@ def reset_user_password(conn, user_id: int, new_password: str):
 
 
 def delete_user(conn, user_id: int):
-    cur = conn.cursor()
-    # delete logs first (foreign key constraint)
-    cur.execute("DELETE FROM food_logs WHERE user_id=?", (user_id,))
-    cur.execute("DELETE FROM users WHERE id=?", (user_id,))
-    conn.commit()
+    """
+    Remove a user and everything logged for them. The account row goes in
+    one short transaction; logs and rollups are then deleted in chunks so
+    other writers are not blocked for the whole delete, and the freed pages
+    are returned to the OS by incremental vacuum (see purge.py).
+    """
+    purge_user(conn, user_id)
+
+# Mifflin-St Jeor activity multipliers; analytics.calorie_goals uses the same table
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very active": 1.9
+}
+DEFAULT_ACTIVITY_FACTOR = 1.2
 
 def predict_calorie_goal(conn, user_id: int) -> int:
     """
@@ -209,8 +471,8 @@ def predict_calorie_goal(conn, user_id: int) -> int:
     """, (user_id,))
     row = cur.fetchone()
 
-    if not row:
-        return 2000  # fallback default
+    if not row or None in (row[0], row[2], row[3]):
+        return 2000  # fallback default (no user or incomplete profile)
 
     age, gender, height, weight, goal_weight, activity_level, weight_goal = row
 
@@ -221,14 +483,7 @@ def predict_calorie_goal(conn, user_id: int) -> int:
         bmr = 10 * weight + 6.25 * height - 5 * age - 161
 
     # --- 2. Activity Factor ---
-    activity_factors = {
-        "sedentary": 1.2,
-        "light": 1.375,
-        "moderate": 1.55,
-        "active": 1.725,
-        "very active": 1.9
-    }
-    factor = activity_factors.get(str(activity_level).lower(), 1.2)
+    factor = ACTIVITY_FACTORS.get(str(activity_level).lower(), DEFAULT_ACTIVITY_FACTOR)
     calories = bmr * factor
 
     # --- 3. Adjust for Weight Goal ---
@@ -238,29 +493,81 @@ def predict_calorie_goal(conn, user_id: int) -> int:
         calories += 500  # surplus
 
     return int(calories)
+
+# Streaks: gaps-and-islands over the logged days in daily_totals. Consecutive
+# days share julianday(date) - ROW_NUMBER(), so each group is one run.
+STREAKS_SQL = """
+    WITH islands AS (
+        SELECT user_id, date,
+               julianday(date) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date) AS grp
+        FROM daily_totals
+        {where}
+    ), runs AS (
+        SELECT user_id, COUNT(*) AS len, MAX(date) AS last_day FROM islands GROUP BY user_id, grp
+    ), ranked AS (
+        SELECT user_id, len, last_day,
+               ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY last_day DESC) AS recency,
+               MAX(len) OVER (PARTITION BY user_id) AS longest
+        FROM runs
+    )
+    SELECT user_id, last_day, len AS current_streak, longest AS longest_streak
+    FROM ranked WHERE recency = 1
+"""
+
+def get_user_streaks(conn, user_id: int) -> Tuple[int, int]:
+    """(current, longest) logging streak for a user, computed in one query."""
+    row = conn.execute(STREAKS_SQL.format(where="WHERE user_id = ?"), (user_id,)).fetchone()
+    return (row[2], row[3]) if row else (0, 0)
+
+def get_streaks_for_users(conn, user_ids: Optional[List[int]] = None) -> dict:
+    """{user_id: (current, longest)} for the given users (all users with logs if None)."""
+    if user_ids is None:
+        rows = conn.execute(STREAKS_SQL.format(where=""))
+    else:
+        placeholders = ", ".join("?" * len(user_ids))
+        rows = conn.execute(STREAKS_SQL.format(where=f"WHERE user_id IN ({placeholders})"), tuple(user_ids))
+    return {user_id: (current, longest) for user_id, _, current, longest in rows}
+
+def _refresh_streak(cursor, user_id: int):
+    """Recompute one user's user_streaks row from daily_totals."""
+    row = cursor.execute(STREAKS_SQL.format(where="WHERE user_id = ?"), (user_id,)).fetchone()
+    if row is None:
+        cursor.execute("DELETE FROM user_streaks WHERE user_id = ?", (user_id,))
+    else:
+        cursor.execute("INSERT OR REPLACE INTO user_streaks (user_id, last_date, current_streak, longest_streak) "
+                       "VALUES (?, ?, ?, ?)", row)
+
+def _advance_streaks(cursor, rows: List[tuple]):
+    """
+    Update user_streaks for newly logged food_logs rows (same tuple layout as
+    _add_to_daily_totals). Appending today or the next day is O(1); a row
+    dated before the user's last logged day recomputes that user's streak.
+    """
+    dates_by_user = {}
+    for row in rows:
+        dates_by_user.setdefault(row[0], set()).add(row[8])
+    for user_id, dates in dates_by_user.items():
+        state = cursor.execute("SELECT last_date, current_streak, longest_streak FROM user_streaks WHERE user_id = ?",
+                               (user_id,)).fetchone()
+        if state is None or min(dates) < state[0]:
+            _refresh_streak(cursor, user_id)
+            continue
+        last_date, current, longest = state
+        for day in sorted(dates):
+            if day == last_date:
+                continue
+            gap = cursor.execute("SELECT julianday(?) - julianday(?)", (day, last_date)).fetchone()[0]
+            current = current + 1 if gap == 1 else 1
+            longest = max(longest, current)
+            last_date = day
+        cursor.execute("UPDATE user_streaks SET last_date = ?, current_streak = ?, longest_streak = ? WHERE user_id = ?",
+                       (last_date, current, longest, user_id))
+
 def get_user_streak(conn, user_id: int) -> int:
-    """Calculate consecutive logging streak for a user."""
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT DISTINCT date
-        FROM food_logs
-        WHERE user_id = ?
-        ORDER BY date DESC
-    """, (user_id,))
-    dates = [row[0] for row in cur.fetchall()]
-    if not dates:
-        return 0
-
-    streak = 1
-    prev = pd.to_datetime(dates[0]).date()
-    for d in dates[1:]:
-        curr = pd.to_datetime(d).date()
-        if (prev - curr).days == 1:
-            streak += 1
-            prev = curr
-        else:
-            break
-    return streak
+    """Current consecutive logging streak for a user (maintained on insert)."""
+    row = conn.execute("SELECT current_streak FROM user_streaks WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
 def get_today_water(conn, user_id: int) -> int:
     cur = conn.cursor()
     cur.execute("SELECT glasses FROM water_logs WHERE user_id=? AND date=date('now')", (user_id,))
@@ -269,21 +576,32 @@ def get_today_water(conn, user_id: int) -> int:
 
 
 def update_water(conn, user_id: int, glasses: int):
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM water_logs WHERE user_id=? AND date=date('now')", (user_id,))
-    row = cur.fetchone()
-    if row:
-        cur.execute("UPDATE water_logs SET glasses=? WHERE id=?", (glasses, row[0]))
-    else:
-        cur.execute("INSERT INTO water_logs (user_id, date, glasses) VALUES (?, date('now'), ?)", (user_id, glasses))
-    conn.commit()
-def add_food(name, calories, carbs, protein, fat, fiber):
-    conn = sqlite3.connect("nutrition_local.db")
     cur = conn.cursor()
     cur.execute(
-        "INSERT INTO foods (name, calories, carbs, protein, fat, fiber) VALUES (?, ?, ?, ?, ?, ?)",
-        (name.lower(), calories, carbs, protein, fat, fiber)
+        """INSERT INTO water_logs (user_id, date, glasses) VALUES (?, date('now'), ?)
+           ON CONFLICT(user_id, date) DO UPDATE SET glasses=excluded.glasses""",
+        (user_id, glasses)
     )
     conn.commit()
-    conn.close()
-    print(f"✅ Added '{name}' to local database.")
\ No newline at end of file
+
+FOOD_UPSERT = """
+    INSERT INTO foods (name, calories, carbs, protein, fat, fiber) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        calories = excluded.calories, carbs = excluded.carbs, protein = excluded.protein,
+        fat = excluded.fat, fiber = excluded.fiber
+"""
+
+def add_food(name, calories, carbs, protein, fat, fiber, db_file: str = NUTRITION_DB_FILE):
+    catalog = get_catalog(db_file)
+    catalog.refresh()  # pick up foreign changes first; catalog.add() below applies only ours
+    with catalog.pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(FOOD_UPSERT, (normalize_name(name), calories, carbs, protein, fat, fiber))
+        conn.commit()
+    # keep the in-memory catalog and search index in step without a reload
+    catalog.add(name, {"calories": calories, "carbs": carbs, "protein": protein, "fat": fat, "fiber": fiber})
+    print(f"✅ Added '{name}' to local database.")
+
+
+# call counts / latency / rows for every public function (see instrumentation.py)
+instrument_module(sys.modules[__name__])
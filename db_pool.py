@@ -0,0 +1,153 @@
+# db_pool.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from sqlite3 import Connection
+from typing import Callable, Dict, Iterator, List, Optional
+
+from instrumentation import TracedConnection
+
+# Applied to every new connection. WAL lets readers run while one writer
+# commits; NORMAL sync is safe under WAL and skips an fsync per commit.
+PRAGMAS = {
+    # only takes effect on new databases; purge.enable_incremental_vacuum converts old ones
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16000,  # KiB (negative) -> ~16 MB page cache per connection
+    "temp_store": "MEMORY",
+}
+MAX_CONNECTIONS = 8
+BUSY_TIMEOUT = 30.0
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _ThreadLease:
+    """Holds a thread's connection; returns it to the pool when the thread ends."""
+
+    def __init__(self, pool: "ConnectionPool", conn: Connection):
+        self.pool = pool
+        self.conn = conn
+
+    def __del__(self):
+        try:
+            self.pool.release(self.conn)
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of sqlite connections to one database file.
+
+    - thread_connection(): the calling thread's own connection, kept for the
+      life of the thread (what connect_to_db hands out)
+    - connection(): borrow a connection for a `with` block (db.borrow_connection;
+      what worker threads use, so idle workers hold no slot)
+    The schema callback runs once per process, on the first connection.
+    """
+
+    def __init__(self, db_file: str, init_schema: Optional[Callable[[Connection], None]] = None,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.db_file = db_file
+        self.init_schema = init_schema
+        self.max_connections = max_connections
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle: List[Connection] = []
+        self._idle_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = init_schema is None
+        self._local = threading.local()
+
+    def _open(self) -> Connection:
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, timeout=BUSY_TIMEOUT,
+                               factory=TracedConnection)
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _ensure_schema(self, conn: Connection):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self.init_schema(conn)
+                self._schema_ready = True
+
+    def acquire(self, timeout: Optional[float] = BUSY_TIMEOUT) -> Connection:
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No free connection to {self.db_file} after {timeout}s")
+        with self._idle_lock:
+            conn = self._idle.pop() if self._idle else None
+        try:
+            if conn is None:
+                conn = self._open()
+            self._ensure_schema(conn)
+        except Exception:
+            if conn is not None:
+                conn.close()
+            self._slots.release()
+            raise
+        return conn
+
+    def release(self, conn: Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._idle_lock:
+            self._idle.append(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def thread_connection(self) -> Connection:
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            lease = self._local.lease = _ThreadLease(self, self.acquire())
+        return lease.conn
+
+    def dedicated_connection(self) -> Connection:
+        """
+        A connection outside the pool's bound, for one long-lived thread that
+        must never wait for a slot (the write-behind writer). Caller closes it.
+        """
+        conn = self._open()
+        try:
+            self._ensure_schema(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def close_idle(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file: str, init_schema: Optional[Callable[[Connection], None]] = None) -> ConnectionPool:
+    """Return the process-wide pool for a database file, creating it on first use."""
+    path = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(db_file, init_schema)
+        elif init_schema is not None and pool.init_schema is None:
+            pool.init_schema = init_schema
+            pool._schema_ready = False
+        return pool
@@ -0,0 +1,250 @@
+# food_catalog.py
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from constant import NUTRITION_DB_FILE
+from db_pool import get_pool
+from migrations import migrate_catalog
+
+NUTRIENT_KEYS = ("calories", "carbs", "protein", "fat", "fiber")
+MAX_PREFIX_SCAN = 2000  # prefix-index entries ranked per lookup (see _best_index)
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case and collapse whitespace, the way food names are stored."""
+    return " ".join(str(name).lower().split())
+
+
+class _Snapshot:
+    """
+    One immutable version of the catalog. Readers grab `catalog._snap` once
+    and use only that object, so a concurrent reload or add() (which build
+    a new snapshot and swap it in with one assignment) is never seen half-done.
+    """
+    __slots__ = ("names", "values", "exact", "prefix_keys", "prefix_ids")
+
+    def __init__(self, names: List[str], values: array, exact: Dict[str, int],
+                 prefix_keys: List[str], prefix_ids: array):
+        self.names = names
+        self.values = values
+        self.exact = exact
+        self.prefix_keys = prefix_keys
+        self.prefix_ids = prefix_ids
+
+
+_EMPTY = _Snapshot([], array("d"), {}, [], array("l"))
+
+
+class FoodCatalog:
+    """
+    In-memory copy of the `foods` table of the local nutrition database.
+
+    The table is loaded once into flat arrays with:
+      - a hash index for exact (normalized) names
+      - a sorted prefix index over full names and every word start in a name,
+        so "rice" finds "white rice" without scanning the table
+    The catalog reloads itself when the database file (or its WAL) changes.
+    """
+
+    def __init__(self, db_path: str = NUTRITION_DB_FILE):
+        self.db_path = db_path
+        self.pool = get_pool(db_path, migrate_catalog)
+        self._lock = threading.RLock()
+        self._fingerprint = None
+        self._snap = _EMPTY
+        self._listeners: List = []
+
+    # ---------------------------
+    # Loading / invalidation
+    # ---------------------------
+    def _current_fingerprint(self) -> Tuple:
+        parts = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                parts.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                parts.append(None)
+        return tuple(parts)
+
+    def _ensure_loaded(self):
+        fingerprint = self._current_fingerprint()
+        if fingerprint == self._fingerprint:
+            return
+        with self._lock:
+            if self._current_fingerprint() != self._fingerprint:
+                self._fingerprint = self._load()
+                self._notify(None)
+
+    def _load(self) -> Tuple:
+        """Rebuild the snapshot; returns the file fingerprint it corresponds to."""
+        with self.pool.connection() as conn:
+            # taken once the (WAL) connection is open: opening it can create
+            # the -wal file, which would otherwise look like a change
+            fingerprint = self._current_fingerprint()
+            rows = conn.execute(
+                "SELECT name, calories, carbs, protein, fat, fiber FROM foods "
+                "WHERE name IS NOT NULL ORDER BY rowid"
+            ).fetchall()
+
+        names: List[str] = []
+        values = array("d")
+        exact: Dict[str, int] = {}
+        for name, *nutrients in rows:
+            key = normalize_name(name)
+            if not key or key in exact:
+                continue  # first row wins for duplicate names
+            exact[key] = len(names)
+            names.append(key)
+            values.extend(float(v or 0) for v in nutrients)
+
+        terms = [(term, idx) for idx, name in enumerate(names) for term in self.index_terms(name)]
+        terms.sort()
+
+        self._snap = _Snapshot(names, values, exact, [t for t, _ in terms], array("l", (i for _, i in terms)))
+        return fingerprint
+
+    @staticmethod
+    def index_terms(name: str) -> List[str]:
+        """The full name plus the remainder of the name at every word start."""
+        terms = [name]
+        pos = name.find(" ")
+        while pos != -1:
+            terms.append(name[pos + 1:])
+            pos = name.find(" ", pos + 1)
+        return terms
+
+    def refresh(self):
+        """Reload if the database file changed since the last load."""
+        self._ensure_loaded()
+
+    def reload(self):
+        """Force a reload on the next lookup."""
+        with self._lock:
+            self._fingerprint = None
+
+    def add(self, name: str, nutrients: Dict[str, float]):
+        """
+        Apply a row just inserted into `foods` without reloading the table.
+        Called by db.add_food after its commit; it refreshes the catalog
+        before writing, so the file change seen here is our own.
+
+        Cost: O(catalog size) per call. The snapshot is copy-on-write, so
+        every add copies the values array and (for a new name) the names,
+        exact and prefix indexes (tens of ms at 300k foods). That suits the
+        occasional add_food; a bulk import should write the rows and let the
+        next lookup reload the table once instead.
+        """
+        if self._fingerprint is None:
+            self._ensure_loaded()
+        key = normalize_name(name)
+        row = [float(nutrients.get(k) or 0) for k in NUTRIENT_KEYS]
+        with self._lock:
+            # copy-on-write: adds are rare, lookups never lock
+            old = self._snap
+            values = array("d", old.values)
+            if key in old.exact:
+                base = old.exact[key] * len(NUTRIENT_KEYS)
+                values[base:base + len(NUTRIENT_KEYS)] = array("d", row)
+                self._snap = _Snapshot(old.names, values, old.exact, old.prefix_keys, old.prefix_ids)
+            elif key:
+                idx = len(old.names)
+                values.extend(row)
+                prefix_keys, prefix_ids = list(old.prefix_keys), array("l", old.prefix_ids)
+                for term in self.index_terms(key):
+                    pos = bisect_left(prefix_keys, term)
+                    prefix_keys.insert(pos, term)
+                    prefix_ids.insert(pos, idx)
+                self._snap = _Snapshot(old.names + [key], values, {**old.exact, key: idx}, prefix_keys, prefix_ids)
+            # our own write changed the file; don't treat it as foreign
+            self._fingerprint = self._current_fingerprint()
+        if key:
+            self._notify(key)
+
+    # ---------------------------
+    # Change listeners
+    # ---------------------------
+    def add_listener(self, callback: Callable[[Optional[str]], None]):
+        """
+        Register callback(name) fired after changes: name is the added food
+        for incremental inserts, or None after a full reload.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, name: Optional[str]):
+        for callback in list(self._listeners):
+            callback(name)
+
+    # ---------------------------
+    # Lookups
+    # ---------------------------
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._snap.names)
+
+    def names(self) -> List[str]:
+        self._ensure_loaded()
+        return list(self._snap.names)
+
+    def best_match(self, food_name: str) -> Optional[str]:
+        self._ensure_loaded()
+        snap = self._snap
+        idx = self._best_index(snap, food_name)
+        return None if idx is None else snap.names[idx]
+
+    def get(self, food_name: str) -> Optional[Dict[str, float]]:
+        """Return per-100g nutrients for the best matching food, or None."""
+        self._ensure_loaded()
+        snap = self._snap
+        idx = self._best_index(snap, food_name)
+        if idx is None:
+            return None
+        base = idx * len(NUTRIENT_KEYS)
+        return dict(zip(NUTRIENT_KEYS, snap.values[base:base + len(NUTRIENT_KEYS)]))
+
+    @staticmethod
+    def _best_index(snap: _Snapshot, food_name: str) -> Optional[int]:
+        """
+        Exact name first, then the shortest name starting with the query,
+        then the shortest name with a word starting with the query.
+        Ties are broken alphabetically so results are deterministic.
+        Only the first MAX_PREFIX_SCAN index entries (in key order) are
+        ranked: a one- or two-letter query gets a good match from the start
+        of its range rather than scanning a large part of the index.
+        """
+        key = normalize_name(food_name)
+        if not key:
+            return None
+        idx = snap.exact.get(key)
+        if idx is not None:
+            return idx
+
+        keys, ids, names = snap.prefix_keys, snap.prefix_ids, snap.names
+        best = None
+        i = bisect_left(keys, key)
+        end = min(len(keys), i + MAX_PREFIX_SCAN)
+        while i < end and keys[i].startswith(key):
+            idx = ids[i]
+            name = names[idx]
+            rank = (0 if keys[i] == name else 1, len(name), name)
+            if best is None or rank < best[0]:
+                best = (rank, idx)
+            i += 1
+        return None if best is None else best[1]
+
+
+_catalogs: Dict[str, FoodCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(db_path: str = NUTRITION_DB_FILE) -> FoodCatalog:
+    """Return the shared catalog for a database file."""
+    path = os.path.abspath(db_path)
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None:
+            catalog = _catalogs[path] = FoodCatalog(db_path)
+        return catalog
@@ -1,25 +1,135 @@
 # food_search.py
-import sqlite3
-from rapidfuzz import fuzz
-from db import connect_to_db
+import heapq
+import os
+import sys
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from constant import NUTRITION_DB_FILE
+from food_catalog import get_catalog, normalize_name
+from instrumentation import instrument_module
+
+MIN_SCORE = 50          # same cutoff the old linear search used
+MAX_CANDIDATES = 200    # names handed to rapidfuzz after trigram filtering
+
+
+def _trigrams(text: str, pad_end: bool = True) -> set:
+    # Pad the start so 1-2 letter prefixes still produce grams; the end is
+    # only padded for indexed names, since a type-ahead query is unfinished.
+    padded = "  " + text + (" " if pad_end else "")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodSearchIndex:
+    """
+    Trigram index over the distinct food names in the nutrition catalog.
+
+    A query collects candidate names sharing the most trigrams with it, then
+    scores only those with rapidfuzz. The index follows the catalog: rows
+    added through db.add_food are indexed incrementally (once per name), a
+    catalog reload triggers a rebuild on the next search. warm() builds it
+    on a background thread ahead of the first search.
+    """
+
+    def __init__(self, db_path: str = NUTRITION_DB_FILE):
+        self.catalog = get_catalog(db_path)
+        self._lock = threading.Lock()
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._stale = True
+        self._building = False
+        self.catalog.add_listener(self._on_catalog_change)
+
+    def _on_catalog_change(self, name: Optional[str]):
+        if name is None:
+            self._stale = True
+        elif not self._stale:
+            with self._lock:
+                self._add(name, self._names, self._ids, self._postings)
+
+    @staticmethod
+    def _add(name: str, names: List[str], ids: Dict[str, int], postings: Dict[str, List[int]]):
+        if name in ids:
+            return  # add_food on an existing name updates nutrients only
+        idx = ids[name] = len(names)
+        names.append(name)  # before the postings: searches read them without the lock
+        for gram in _trigrams(name):
+            postings[gram].append(idx)
+
+    def _rebuild(self):
+        with self._lock:  # a search arriving mid-build waits here rather than seeing a partial index
+            if not self._stale:
+                return
+            self._building = True
+            try:
+                self.catalog.refresh()
+                self._stale = False  # cleared before reading so a reload during the build marks it again
+                names: List[str] = []
+                ids: Dict[str, int] = {}
+                postings: Dict[str, List[int]] = defaultdict(list)
+                for name in self.catalog.names():
+                    self._add(name, names, ids, postings)
+                self._names, self._ids, self._postings = names, ids, postings
+            finally:
+                self._building = False
+
+    def warm(self) -> threading.Thread:
+        """Build the index on a background thread so the first search doesn't pay for it."""
+        thread = threading.Thread(target=self._rebuild, name="nutriai-search-index", daemon=True)
+        thread.start()
+        return thread
+
+    def search(self, keyword: str, limit: int = 8) -> List[str]:
+        keyword = normalize_name(keyword)
+        if not keyword:
+            return []
+        self.catalog.refresh()
+        if self._stale or self._building:
+            self._rebuild()
+        names, postings = self._names, self._postings
+
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in _trigrams(keyword, pad_end=False):
+            for idx in postings.get(gram, ()):
+                counts[idx] += 1
+        if not counts:
+            return []
+
+        from rapidfuzz import fuzz, process  # imported on first search, not at startup
+
+        top = heapq.nlargest(MAX_CANDIDATES, counts.items(), key=lambda kv: kv[1])
+        choices = {idx: names[idx] for idx, _ in top}
+        matches = process.extract(keyword, choices, scorer=fuzz.partial_ratio,
+                                  score_cutoff=MIN_SCORE, limit=limit)
+        return [name for name, score, idx in matches if score > MIN_SCORE]
+
+
+_indexes: Dict[str, FoodSearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(db_path: str = NUTRITION_DB_FILE) -> FoodSearchIndex:
+    path = os.path.abspath(db_path)  # same key as get_catalog, so one index per file
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = FoodSearchIndex(db_path)
+        return index
+
+
+def warm_search_index(db_path: str = NUTRITION_DB_FILE) -> threading.Thread:
+    """Start building the search index in the background (the Tk app calls this at startup)."""
+    return get_search_index(db_path).warm()
+
 
 def search_foods(keyword: str, limit: int = 8):
     """
     Search the local nutrition database for foods similar to the keyword.
     Returns a list of matching food names.
     """
-    keyword = keyword.strip().lower()
-    if not keyword:
-        return []
-
-    conn = sqlite3.connect("nutrition_local.db")
-    cur = conn.cursor()
-    cur.execute("SELECT food_name FROM food_logs")
-    all_foods = [row[0] for row in cur.fetchall()]
-    conn.close()
-
-    # Fuzzy matching: allow slight typos
-    scored = [(food_name, fuzz.partial_ratio(keyword, food_name.lower())) for food_name in all_foods]
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return [food_name for food_name, score in scored[:limit] if score > 50]
-#this file is not been used now
\ No newline at end of file
+    return get_search_index().search(keyword, limit)
+
+
+instrument_module(sys.modules[__name__])
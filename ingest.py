@@ -0,0 +1,142 @@
+# ingest.py
+"""
+Load a nutrition dataset into the local catalog (foods table).
+
+    python ingest.py nutrition.csv
+    python ingest.py fdc_export.parquet --map name=description --map calories=energy_kcal
+
+Rows are streamed in chunks and upserted by name in short transactions, so
+memory stays bounded and the app can keep reading the catalog meanwhile.
+"""
+import argparse
+import csv
+import math
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from constant import NUTRITION_DB_FILE
+from db import FOOD_UPSERT
+from food_catalog import NUTRIENT_KEYS, get_catalog, normalize_name
+from utils import info, warn
+
+CHUNK_SIZE = 5000
+FIELDS = ("name",) + NUTRIENT_KEYS
+
+
+def _read_csv(path: str, chunk_size: int) -> Iterator[List[Dict]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _read_parquet(path: str, chunk_size: int) -> Iterator[List[Dict]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet input needs pyarrow (pip install pyarrow)") from e
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+def read_chunks(path: str, fmt: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict]]:
+    fmt = fmt or ("parquet" if path.lower().endswith((".parquet", ".pq")) else "csv")
+    if fmt == "parquet":
+        return _read_parquet(path, chunk_size)
+    return _read_csv(path, chunk_size)
+
+
+def validate_row(row: Dict, mapping: Dict[str, str]) -> Tuple[Optional[tuple], Optional[str]]:
+    """Return (db_row, None) or (None, reason) for one input record."""
+    name = normalize_name(row.get(mapping["name"]) or "")
+    if not name:
+        return None, "missing name"
+    values = []
+    for key in NUTRIENT_KEYS:
+        raw = row.get(mapping[key])
+        if raw is None or raw == "":
+            values.append(0.0)  # absent nutrient -> 0, as the notebook import did
+            continue
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            return None, f"{key} is not a number: {raw!r}"
+        if not math.isfinite(value) or value < 0:
+            return None, f"{key} out of range: {raw!r}"
+        values.append(value)
+    return (name, *values), None
+
+
+def ingest_file(path: str, db_file: str = NUTRITION_DB_FILE, fmt: Optional[str] = None,
+                chunk_size: int = CHUNK_SIZE, mapping: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """
+    Stream a CSV/Parquet file into foods, one transaction per chunk.
+    Returns counts: read, upserted, rejected.
+    """
+    mapping = {**{f: f for f in FIELDS}, **(mapping or {})}
+    catalog = get_catalog(db_file)
+    stats = {"read": 0, "upserted": 0, "rejected": 0}
+
+    with catalog.pool.connection() as conn:
+        for chunk in read_chunks(path, fmt, chunk_size):
+            rows = []
+            for row in chunk:
+                stats["read"] += 1
+                db_row, reason = validate_row(row, mapping)
+                if db_row is None:
+                    stats["rejected"] += 1
+                    if stats["rejected"] <= 10:
+                        warn(f"row {stats['read']}: {reason}")
+                    continue
+                rows.append(db_row)
+            try:
+                conn.executemany(FOOD_UPSERT, rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            stats["upserted"] += len(rows)
+            info(f"{stats['read']} rows read, {stats['upserted']} upserted")
+
+        # refresh planner statistics for the grown table
+        conn.execute("PRAGMA optimize")
+
+    # in-process catalog and search index reload on next use; other
+    # processes notice the changed file themselves
+    catalog.reload()
+    return stats
+
+
+def _parse_mapping(pairs: List[str]) -> Dict[str, str]:
+    mapping = {}
+    for pair in pairs:
+        field, sep, column = pair.partition("=")
+        if not sep or field not in FIELDS:
+            raise argparse.ArgumentTypeError(f"--map expects FIELD=COLUMN with FIELD in {FIELDS}")
+        mapping[field] = column
+    return mapping
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load foods into the local nutrition catalog")
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--db", default=NUTRITION_DB_FILE, help="catalog database file")
+    parser.add_argument("--format", choices=("csv", "parquet"), default=None,
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                        help="read FIELD from a differently named column")
+    args = parser.parse_args(argv)
+
+    stats = ingest_file(args.path, args.db, args.format, args.chunk_size, _parse_mapping(args.map))
+    print(f"Done: {stats['read']} read, {stats['upserted']} upserted, {stats['rejected']} rejected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+# instrumentation.py
+"""
+Call counts, latency histograms and row counts for the data layer.
+
+    @timed()                         # or timed("custom.name")
+    def fetch(...): ...
+
+    with span("ingest.chunk") as s:
+        ...
+        s.rows = len(chunk)
+
+    instrument_module(sys.modules[__name__])   # at the bottom of a module
+
+Every public function (and public method of a public class) in db.py,
+nutrition.py, usda_api.py and food_search.py is wrapped this way. Pooled
+sqlite connections use TracedConnection, which times each statement and
+logs statements slower than SLOW_SQL_MS together with their EXPLAIN QUERY
+PLAN. Export with export_prometheus() or export_json() (server.py serves
+both on GET /metrics).
+"""
+import functools
+import inspect
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("NutriAI.Metrics")
+
+# upper bounds in milliseconds; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SLOW_SQL_MS = float(os.environ.get("NUTRIAI_SLOW_SQL_MS", 100))
+MAX_SQL_KEYS = 500      # distinct statements tracked before new ones share "other"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (None if empty)."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return float("inf")
+
+
+class Stat:
+    """Metrics for one instrumented name."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.latency = Histogram()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.functions: Dict[str, Stat] = {}
+        self.sql: Dict[str, Stat] = {}
+
+    def record(self, table: Dict[str, Stat], name: str, elapsed_ms: float, rows: Optional[int], error: bool):
+        with self._lock:
+            stat = table.get(name)
+            if stat is None:
+                if table is self.sql and len(table) >= MAX_SQL_KEYS:
+                    name = "other"
+                stat = table.setdefault(name, Stat())
+            stat.calls += 1
+            stat.errors += error
+            if rows is not None:
+                stat.rows += rows
+            stat.latency.observe(elapsed_ms)
+
+    def reset(self):
+        with self._lock:
+            self.functions.clear()
+            self.sql.clear()
+
+
+registry = Registry()
+
+
+def _row_count(result: Any) -> Optional[int]:
+    """Rows in a typical data-layer result: a list, a DataFrame, or a (rows, cursor) page."""
+    if isinstance(result, list):
+        return len(result)
+    if hasattr(result, "shape"):
+        return int(result.shape[0])
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return None
+
+
+class Span:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Optional[int] = None
+
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """Time a block under `name`; set .rows on the yielded span to record a row count."""
+    s = Span(name)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield s
+    except BaseException:
+        error = True
+        raise
+    finally:
+        registry.record(registry.functions, name, (time.perf_counter() - start) * 1000, s.rows, error)
+
+
+def timed(name: Optional[str] = None):
+    """Decorator form of span(); row counts are taken from the return value."""
+    def decorate(fn):
+        if getattr(fn, "__instrumented__", False):
+            return fn
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                registry.record(registry.functions, label, (time.perf_counter() - start) * 1000, None, True)
+                raise
+            registry.record(registry.functions, label, (time.perf_counter() - start) * 1000, _row_count(result), False)
+            return result
+
+        wrapper.__instrumented__ = True
+        return wrapper
+    return decorate
+
+
+def instrument_module(module) -> List[str]:
+    """
+    Wrap every public function and public method of every public class
+    defined in `module` with timed(). Returns the wrapped names.
+    """
+    wrapped = []
+    for attr, obj in list(vars(module).items()):
+        if attr.startswith("_") or getattr(obj, "__module__", None) != module.__name__:
+            continue
+        if inspect.isfunction(obj):
+            setattr(module, attr, timed()(obj))
+            wrapped.append(attr)
+        elif inspect.isclass(obj) and not issubclass(obj, BaseException):
+            for meth_name, meth in list(vars(obj).items()):
+                if meth_name.startswith("_") or not inspect.isfunction(meth):
+                    continue
+                setattr(obj, meth_name, timed()(meth))
+                wrapped.append(f"{attr}.{meth_name}")
+    return wrapped
+
+
+# ---------------------------
+# SQL tracing
+# ---------------------------
+_WS = re.compile(r"\s+")
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def _statement_key(sql: str) -> str:
+    return _WS.sub(" ", sql).strip()[:120]
+
+
+class TracedCursor(sqlite3.Cursor):
+    def _traced(self, method, sql: str, params, explain_params):
+        start = time.perf_counter()
+        error = False
+        try:
+            return method(sql, params)
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            rows = self.rowcount if self.rowcount >= 0 else None
+            registry.record(registry.sql, _statement_key(sql), elapsed, rows, error)
+            if elapsed >= SLOW_SQL_MS and not error:
+                self._log_slow(sql, explain_params, elapsed)
+
+    def _log_slow(self, sql: str, params, elapsed: float):
+        plan = ""
+        if sql.split(None, 1)[0].upper() in EXPLAINABLE:
+            try:
+                rows = self.connection.cursor(sqlite3.Cursor).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                plan = "\n".join(f"    {row[-1]}" for row in rows)
+            except sqlite3.Error as e:
+                plan = f"    (no plan: {e})"
+        logger.warning("Slow SQL (%.1f ms): %s%s", elapsed, _statement_key(sql), "\n" + plan if plan else "")
+
+    def execute(self, sql, parameters=()):
+        return self._traced(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq = seq_of_parameters if isinstance(seq_of_parameters, (list, tuple)) else list(seq_of_parameters)
+        return self._traced(super().executemany, sql, seq, seq[0] if seq else ())
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (including conn.execute) are TracedCursors."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ---------------------------
+# Export
+# ---------------------------
+def export_json() -> Dict[str, Any]:
+    def dump(table: Dict[str, Stat]):
+        return {name: {"calls": s.calls, "errors": s.errors, "rows": s.rows,
+                       "total_ms": round(s.latency.sum, 3),
+                       "p50_ms": s.latency.percentile(0.5), "p99_ms": s.latency.percentile(0.99),
+                       "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS_MS] + ["+Inf"], s.latency.counts))}
+                for name, s in sorted(table.items())}
+    with registry._lock:
+        return {"functions": dump(registry.functions), "sql": dump(registry.sql)}
+
+
+def _escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def export_prometheus() -> str:
+    lines = []
+    with registry._lock:
+        for metric, label, table in (("nutriai_call", "function", registry.functions),
+                                     ("nutriai_sql", "statement", registry.sql)):
+            lines.append(f"# TYPE {metric}_duration_seconds histogram")
+            for name, s in sorted(table.items()):
+                tag = f'{label}="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS_MS + (float("inf"),), s.latency.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+                    lines.append(f'{metric}_duration_seconds_bucket{{{tag},le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_duration_seconds_sum{{{tag}}} {s.latency.sum / 1000:.6f}")
+                lines.append(f"{metric}_duration_seconds_count{{{tag}}} {s.calls}")
+            for suffix, attr in (("errors_total", "errors"), ("rows_total", "rows")):
+                lines.append(f"# TYPE {metric}_{suffix} counter")
+                for name, s in sorted(table.items()):
+                    lines.append(f'{metric}_{suffix}{{{label}="{_escape(name)}"}} {getattr(s, attr)}')
+    return "\n".join(lines) + "\n"
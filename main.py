@@ -1,4 +1,7 @@
 # main.py
+# Keep this import graph light: matplotlib, pandas and rapidfuzz load on first
+# use (charts, analytics, search) so the login screen appears right away.
+# `python benchmark.py startup` fails if one of them is imported eagerly.
 import tkinter as tk
 from ui import ModernNutritionTracker
 from db import connect_to_db, create_user
@@ -0,0 +1,90 @@
+# maintenance.py
+"""
+Database maintenance commands.
+
+    python maintenance.py verify-totals [--user ID]
+    python maintenance.py rebuild-totals [--user ID]
+    python maintenance.py purge --user ID [ID ...] [--chunk-size N] [--no-vacuum]
+    python maintenance.py purge-resume
+    python maintenance.py vacuum
+    python maintenance.py enable-incremental-vacuum
+"""
+import argparse
+import sys
+
+from constant import DB_FILE
+from db import connect_to_db, rebuild_daily_totals, verify_daily_totals
+from purge import (CHUNK_SIZE, auto_vacuum_mode, enable_incremental_vacuum, enqueue_purge,
+                   incremental_vacuum, pending_purges, run_purge_queue)
+
+
+def _print_progress(user_id: int, table: str, deleted: int):
+    print(f"  user {user_id}: {deleted} row(s) from {table}", flush=True)
+
+
+def _print_user_done(user_id: int, done: int, total: int):
+    print(f"user {user_id} purged ({done}/{total})", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="NutriAI database maintenance")
+    parser.add_argument("--db", default=DB_FILE, help="tracker database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("verify-totals", "compare daily_totals with food_logs"),
+                            ("rebuild-totals", "recompute daily_totals from food_logs")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--user", type=int, default=None, help="only this user id")
+
+    for name, help_text in (("purge", "delete users and all their data in chunks"),
+                            ("purge-resume", "finish purges left in purge_queue")):
+        p = sub.add_parser(name, help=help_text)
+        if name == "purge":
+            p.add_argument("--user", type=int, nargs="+", required=True, help="user id(s) to delete")
+        p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows deleted per transaction")
+        p.add_argument("--no-vacuum", action="store_true", help="skip incremental vacuum afterwards")
+    sub.add_parser("vacuum", help="release free pages (incremental vacuum)")
+    sub.add_parser("enable-incremental-vacuum", help="switch the file to auto_vacuum=INCREMENTAL (full VACUUM)")
+
+    args = parser.parse_args(argv)
+    conn = connect_to_db(args.db)
+
+    if args.command == "verify-totals":
+        mismatches = verify_daily_totals(conn, args.user)
+        for user_id, day in mismatches:
+            print(f"mismatch: user {user_id} on {day}")
+        print(f"{len(mismatches)} mismatched day(s)")
+        return 1 if mismatches else 0
+
+    if args.command == "rebuild-totals":
+        rebuild_daily_totals(conn, args.user)
+        print("daily_totals rebuilt")
+        return 0
+
+    if args.command in ("purge", "purge-resume"):
+        if args.command == "purge":
+            queued = enqueue_purge(conn, args.user)
+            missing = sorted(set(args.user) - set(queued))
+            if missing:
+                print(f"no such user(s): {missing}")
+        print(f"{len(pending_purges(conn))} user(s) to purge")
+        totals = run_purge_queue(conn, args.chunk_size, _print_progress, not args.no_vacuum, _print_user_done)
+        print("deleted: " + ", ".join(f"{k}={v}" for k, v in totals.items()))
+        return 0
+
+    if args.command == "vacuum":
+        if auto_vacuum_mode(conn) != 2:
+            print("auto_vacuum is not INCREMENTAL; run enable-incremental-vacuum first")
+            return 1
+        print(f"{incremental_vacuum(conn)} page(s) freed")
+        return 0
+
+    if args.command == "enable-incremental-vacuum":
+        enable_incremental_vacuum(conn)
+        print(f"auto_vacuum = {auto_vacuum_mode(conn)} (2 = INCREMENTAL)")
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+# migrations.py
+from sqlite3 import Connection
+from typing import List, Tuple
+
+# Ordered (version, statements). A database at PRAGMA user_version N gets
+# every migration above N applied, each in its own transaction. Never edit a
+# released migration; append a new one.
+MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            age INTEGER,
+            gender TEXT,
+            height REAL,
+            weight REAL,
+            goal_weight REAL,
+            activity_level TEXT,
+            weight_goal TEXT,
+            is_admin INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS food_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            food_name TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            carbs REAL,
+            calories REAL,
+            protein REAL,
+            fat REAL,
+            fiber REAL,
+            date DATE NOT NULL,
+            meal_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS water_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            date TEXT,
+            glasses INTEGER DEFAULT 0,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )''',
+    ]),
+    (2, [
+        # per-user history, plots and streaks: seek on user_id, ordered by date,
+        # nutrient sums read straight from the index
+        '''
+        CREATE INDEX IF NOT EXISTS idx_food_logs_user_date
+        ON food_logs (user_id, date, calories, carbs, protein, fat, fiber)''',
+        # keep the latest row per (user_id, date) so the unique index can be built
+        '''
+        DELETE FROM water_logs WHERE id NOT IN (
+            SELECT MAX(id) FROM water_logs GROUP BY user_id, date
+        )''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_water_logs_user_date
+        ON water_logs (user_id, date)''',
+    ]),
+    (3, [
+        # per-user per-day sums, kept current by db.log_food_db / log_foods_batch_db
+        '''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            calories REAL NOT NULL DEFAULT 0,
+            carbs REAL NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            fat REAL NOT NULL DEFAULT 0,
+            fiber REAL NOT NULL DEFAULT 0,
+            entry_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID''',
+        '''
+        INSERT OR REPLACE INTO daily_totals (user_id, date, calories, carbs, protein, fat, fiber, entry_count)
+        SELECT user_id, date, COALESCE(SUM(calories), 0), COALESCE(SUM(carbs), 0),
+               COALESCE(SUM(protein), 0), COALESCE(SUM(fat), 0), COALESCE(SUM(fiber), 0), COUNT(*)
+        FROM food_logs WHERE user_id IS NOT NULL
+        GROUP BY user_id, date''',
+    ]),
+    (4, [
+        # (user_id, date) + implicit rowid: keyset pagination on (date, id)
+        "CREATE INDEX IF NOT EXISTS idx_food_logs_user_day ON food_logs (user_id, date)",
+    ]),
+    (5, [
+        # written by scoring_job.py (nightly), one row per user
+        '''
+        CREATE TABLE IF NOT EXISTS user_metrics (
+            user_id INTEGER PRIMARY KEY,
+            calorie_goal INTEGER NOT NULL,
+            days_logged INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            avg_calories REAL,
+            avg_carbs REAL,
+            avg_protein REAL,
+            avg_fat REAL,
+            goal_hit_days INTEGER NOT NULL DEFAULT 0,
+            goal_adherence REAL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    (6, [
+        # streak state per user, advanced by db.log_food_db / log_foods_batch_db
+        '''
+        CREATE TABLE IF NOT EXISTS user_streaks (
+            user_id INTEGER PRIMARY KEY,
+            last_date TEXT NOT NULL,
+            current_streak INTEGER NOT NULL,
+            longest_streak INTEGER NOT NULL
+        )''',
+        # backfill: a frozen copy of db.STREAKS_SQL as of this migration, not an
+        # import. Released migrations must not change when db.py evolves, and
+        # db imports this module, so importing from db would be circular.
+        '''
+        INSERT OR REPLACE INTO user_streaks (user_id, last_date, current_streak, longest_streak)
+        WITH islands AS (
+            SELECT user_id, date,
+                   julianday(date) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date) AS grp
+            FROM daily_totals
+        ), runs AS (
+            SELECT user_id, COUNT(*) AS len, MAX(date) AS last_day FROM islands GROUP BY user_id, grp
+        ), ranked AS (
+            SELECT user_id, len, last_day,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY last_day DESC) AS recency,
+                   MAX(len) OVER (PARTITION BY user_id) AS longest
+            FROM runs
+        )
+        SELECT user_id, last_day, len, longest FROM ranked WHERE recency = 1''',
+    ]),
+    (7, [
+        # accounts being deleted by purge.py; rows stay until every dependent
+        # table is cleared, so an interrupted purge resumes where it stopped
+        '''
+        CREATE TABLE IF NOT EXISTS purge_queue (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    (8, [
+        # admin user directory: per-user log summary kept on the users row by
+        # db._add_to_daily_totals, so listing and sorting never touch food_logs
+        "ALTER TABLE users ADD COLUMN log_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN last_log_date TEXT NOT NULL DEFAULT ''",
+        '''
+        UPDATE users SET
+            log_count = COALESCE((SELECT SUM(entry_count) FROM daily_totals WHERE user_id = users.id), 0),
+            last_log_date = COALESCE((SELECT MAX(date) FROM daily_totals WHERE user_id = users.id), '')''',
+        # keyset pagination per sort column (the rowid tiebreak is implicit);
+        # username prefix and ordering use the UNIQUE index
+        "CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_users_log_count ON users (log_count)",
+        "CREATE INDEX IF NOT EXISTS idx_users_last_log ON users (last_log_date)",
+        "CREATE INDEX IF NOT EXISTS idx_users_activity ON users (activity_level, is_admin)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Migrations for the nutrition catalog DB (foods table, per 100 g values).
+CATALOG_MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS foods (
+            name TEXT,
+            calories INTEGER,
+            carbs REAL,
+            protein REAL,
+            fat REAL,
+            fiber REAL
+        )''',
+    ]),
+    (2, [
+        # names are stored lower-case (as db.add_food always did) and unique,
+        # so ingestion can upsert instead of replacing the table
+        "UPDATE foods SET name = lower(trim(name)) WHERE name <> lower(trim(name))",
+        "DELETE FROM foods WHERE name IS NULL OR name = ''",
+        '''
+        DELETE FROM foods WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM foods GROUP BY name
+        )''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_foods_name ON foods (name)",
+    ]),
+]
+
+
+def get_version(conn: Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: Connection, migrations: List[Tuple[int, List[str]]] = MIGRATIONS) -> int:
+    """Bring the database up to the latest schema version. Returns that version."""
+    current = get_version(conn)
+    for version, statements in migrations:
+        if version <= current:
+            continue
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            # re-check under the write lock: another process may have migrated
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            for sql in statements:
+                cur.execute(sql)
+            cur.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
+
+
+def migrate_catalog(conn: Connection) -> int:
+    return migrate(conn, CATALOG_MIGRATIONS)
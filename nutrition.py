@@ -1,10 +1,17 @@
 # nutrition.py
-from db import log_food_db, view_past_logs, fetch_past_logs_for_plot
+import sys
+import threading
+from concurrent.futures import Future
+from cache import LRUCache
+from constant import DB_FILE
+from db import log_food_db, log_foods_batch_db, fetch_past_logs_for_plot
+from food_catalog import FoodCatalog, normalize_name
+from instrumentation import instrument_module
+from resolver import CatalogSource, DictSource, EstimateSource, IncompleteResolution, NutrientResolver
 from usda_api import USDANutritionAPI
-from typing import Tuple, Dict, Any
+from typing import Dict, Iterable, List, Optional, Tuple
 from utils import parse_date, warn
-import pandas as pd
-from typing import Optional, Tuple
+from write_behind import get_write_behind
 
 # small fallback DB (you can keep the one you had)
 FOOD_DATABASE = {
@@ -40,6 +47,95 @@ FOOD_DATABASE = {
     "chickpeas": {"carbs": 27, "calories": 139, "protein": 7.1, "fat": 2.6, "fiber": 7.1}
 }
 
+# Per-100g lookups by (catalog path, normalized name). Misses that ended in
+# an estimate are cached too. Entries are dropped when the catalog changes in
+# this process; the TTL bounds staleness after changes made by other processes.
+LOOKUP_CACHE_SIZE = 2048
+LOOKUP_CACHE_TTL = 3600
+LOOKUP_RETRIES = 1      # extra resolves when a source timed out or failed
+lookup_cache = LRUCache(max_items=LOOKUP_CACHE_SIZE, ttl=LOOKUP_CACHE_TTL)
+_watched_catalogs = set()
+_resolvers: Dict[Optional[str], NutrientResolver] = {}
+_watch_lock = threading.Lock()
+
+def _watch_catalog(catalog: FoodCatalog):
+    """Invalidate cached lookups for `catalog` when foods are added or it reloads."""
+    with _watch_lock:
+        if catalog.db_path in _watched_catalogs:
+            return
+        _watched_catalogs.add(catalog.db_path)
+
+    def changed(name: Optional[str]):
+        if name is None:
+            lookup_cache.invalidate(lambda key: key[0] == catalog.db_path)
+            return
+        # an added food can become the best match for any query that prefixes one of its terms
+        terms = FoodCatalog.index_terms(normalize_name(name))
+        lookup_cache.invalidate(lambda key: key[0] == catalog.db_path and any(t.startswith(key[1]) for t in terms))
+
+    catalog.add_listener(changed)
+
+def lookup_cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters of the nutrition lookup cache."""
+    return lookup_cache.stats()
+
+def _resolve_per_100g(food_name: str, usda_api: Optional[USDANutritionAPI] = None) -> Tuple[Dict[str, float], bool]:
+    """
+    Nutrients per 100 g from the resolver chain (USDA catalog, then
+    FOOD_DATABASE, then a conservative estimate). Returns (nutrients,
+    was_estimated); results are served from lookup_cache when possible.
+    Raises IncompleteResolution rather than return a possibly wrong answer.
+    """
+    catalog = usda_api.catalog if usda_api else None
+    key = (catalog.db_path if catalog else None, normalize_name(food_name))
+    cached = lookup_cache.get(key)
+    if cached is not None:
+        return dict(cached[0]), cached[1]
+    if catalog is not None:
+        _watch_catalog(catalog)
+    nutrients, estimated = _lookup_per_100g(food_name, usda_api)
+    lookup_cache.put(key, (nutrients, estimated))
+    return dict(nutrients), estimated
+
+def get_resolver(usda_api: Optional[USDANutritionAPI] = None) -> NutrientResolver:
+    """
+    The lookup chain for a catalog: sqlite catalog, FOOD_DATABASE, estimate
+    (no catalog tier without usda_api). Replace it with set_resolver().
+    """
+    db_path = usda_api.catalog.db_path if usda_api else None
+    with _watch_lock:
+        if db_path not in _resolvers:
+            sources = [CatalogSource(db_path)] if db_path else []
+            _resolvers[db_path] = NutrientResolver(sources + [DictSource(FOOD_DATABASE), EstimateSource()])
+        return _resolvers[db_path]
+
+def set_resolver(resolver: NutrientResolver, db_path: Optional[str] = None):
+    """Use `resolver` for lookups against the catalog at db_path (None: lookups without usda_api)."""
+    with _watch_lock:
+        _resolvers[db_path] = resolver
+    lookup_cache.invalidate(lambda key: key[0] == db_path)
+
+def _lookup_per_100g(food_name: str, usda_api: Optional[USDANutritionAPI] = None) -> Tuple[Dict[str, float], bool]:
+    """
+    The uncached lookup. A resolution is only used if no source timed out or
+    failed on the way to it; otherwise it is retried, then refused.
+    """
+    resolver = get_resolver(usda_api)
+    for _ in range(LOOKUP_RETRIES + 1):
+        resolution = resolver.resolve(food_name)
+        if resolution.complete:
+            break
+    else:
+        raise IncompleteResolution(f"Nutrient lookup for '{food_name}' did not complete "
+                                   f"(a source timed out or failed); nothing was logged")
+    if resolution.estimated:
+        warn(f"No USDA or local data for '{food_name}', inserting estimated values.")
+    return resolution.nutrients, resolution.estimated
+
+def _scale(per_100g: Dict[str, float], quantity: float) -> Dict[str, float]:
+    ratio = quantity / 100.0
+    return {k: round(v * ratio, 2) for k, v in per_100g.items()}
+
 def log_food(conn, user_id: Optional[int], food_name: str, quantity: float, date_str: str, meal_type: str, usda_api: Optional[USDANutritionAPI]= None) -> Tuple[bool, Optional[int]]:
     """
     Attempts to fetch nutrition from USDA API, falls back to local DB, or uses estimates.
@@ -47,59 +143,79 @@ def log_food(conn, user_id: Optional[int], food_name: str, quantity: float, date
     """
     # validate inputs
     date = parse_date(date_str)
-    nutrition_info = None
     if user_id is None:
         return True, None  # not logged in
 
-    nutrition_data = None
-    if usda_api:
-        try:
-            nutrition_info = usda_api.get_nutrition_for_food(food_name, quantity)
-        except Exception as e:
-            warn(f"USDA API error: {e}")
-
-    estimated = False
-    if not nutrition_info:
-        key = food_name.lower()
-        if key in FOOD_DATABASE:
-            n = FOOD_DATABASE[key]
-            ratio = quantity / 100.0
-            nutrition_info = {
-                "calories":n["calories"] * ratio,
-                "carbs":n["carbs"] * ratio,
-                "protein":n["protein"] * ratio,
-                "fat":n["fat"] * ratio,
-                "fiber":n.get("fiber", 0) * ratio
-            }
+    row, estimated = _food_log_row(user_id, food_name, quantity, date, meal_type, usda_api)
+    return estimated, log_food_db(conn, *row)
+
+def _food_log_row(user_id: int, food_name: str, quantity: float, date, meal_type: str,
+                  usda_api: Optional[USDANutritionAPI]) -> Tuple[tuple, bool]:
+    per_100g, estimated = _resolve_per_100g(food_name, usda_api)
+    n = _scale(per_100g, quantity)
+    return (user_id, food_name, quantity, n["carbs"], n["calories"], n["protein"], n["fat"], n["fiber"],
+            date.isoformat(), meal_type), estimated
+
+def queue_log_food(user_id: Optional[int], food_name: str, quantity: float, date_str: str, meal_type: str,
+                   usda_api: Optional[USDANutritionAPI] = None, db_file: str = DB_FILE) -> Tuple[bool, Optional[Future]]:
+    """
+    Write-behind log_food: nutrients are resolved here, the row is committed
+    later by the write_behind group-commit thread. Returns (was_estimated,
+    Future of the row id); wait on the future for durability or drop it.
+    """
+    date = parse_date(date_str)
+    if user_id is None:
+        return True, None
+    row, estimated = _food_log_row(user_id, food_name, quantity, date, meal_type, usda_api)
+    return estimated, get_write_behind(db_file).submit(row)
+
+def log_foods_batch(conn, records: Iterable[Tuple[Optional[int], str, float, str, str]],
+                    usda_api: Optional[USDANutritionAPI] = None) -> List[Tuple[bool, Optional[int]]]:
+    """
+    Log many (user_id, food_name, quantity, date_str, meal_type) records at once.
+    Each distinct food is resolved once and all rows are inserted in a single
+    transaction. Returns one (was_estimated, row_id) per record, in order;
+    records without a user get (True, None) like log_food.
+    Raises ValueError (and inserts nothing) if any date is invalid.
+    """
+    records = list(records)
+    dates = [parse_date(date_str) for _, _, _, date_str, _ in records]
+
+    resolved: Dict[str, Tuple[Dict[str, float], bool]] = {}
+    for user_id, food_name, *_ in records:
+        key = normalize_name(food_name)  # same key as the catalog and lookup_cache
+        if user_id is not None and key not in resolved:
+            resolved[key] = _resolve_per_100g(food_name.strip(), usda_api)
+
+    rows = []
+    for (user_id, food_name, quantity, _, meal_type), date in zip(records, dates):
+        if user_id is None:
+            continue
+        n = _scale(resolved[normalize_name(food_name)][0], quantity)
+        rows.append((user_id, food_name, quantity, n["carbs"], n["calories"], n["protein"],
+                     n["fat"], n["fiber"], date.isoformat(), meal_type))
+    row_ids = iter(log_foods_batch_db(conn, rows))
+
+    results = []
+    for user_id, food_name, *_ in records:
+        if user_id is None:
+            results.append((True, None))
         else:
-            # Use conservative estimate but mark as estimated
-            ratio = quantity / 100.0
-            nutrition_info = {
-                "calories":100 * ratio,
-                "carbs":20 * ratio,
-                "protein":5 * ratio,
-                "fat":3 * ratio,
-                "fiber":2 * ratio
-            }
-            estimated = True
-            warn(f"No USDA or local data for '{food_name}', inserting estimated values.")
-
-    row_id = log_food_db(conn, user_id, food_name, quantity,
-                         nutrition_info["carbs"], nutrition_info["calories"],
-                         nutrition_info["protein"], nutrition_info["fat"], nutrition_info["fiber"],
-                         date.isoformat(), meal_type)
-    return estimated, row_id
+            results.append((resolved[normalize_name(food_name)][1], next(row_ids)))
+    return results
 
 def generate_recommendations(conn, user_id):
-    logs = view_past_logs(conn, user_id)
-    if not logs:
+    from analytics import analyze_user
+    result = analyze_user(conn, user_id)
+    if result["metrics"] is None:
         return {"error": "No logs found"}
-    df = pd.DataFrame(logs, columns=["Date", "Food", "Quantity", "Carbs", "Calories", "Protein", "Fat"])
-    # compute averages and reuse your original logic
-    daily_avg_calories = df['Calories'].mean()
-    # ... produce recommendations similarly to your original code
-    return {"summary": f"Avg calories: {daily_avg_calories:.0f}"}
+    return {
+        "summary": f"Avg calories: {result['metrics']['avg_calories']:.0f}",
+        "recommendations": result["recommendations"],
+    }
 
 # expose analytic helper
 def fetch_for_plot(conn, user_id):
     return fetch_past_logs_for_plot(conn, user_id)
+
+instrument_module(sys.modules[__name__])
@@ -0,0 +1,165 @@
+# purge.py
+"""
+Account deletion in bounded chunks.
+
+Deleting a user takes three steps:
+  1. enqueue: one short transaction moves the user into purge_queue and
+     removes the users row, so the account is gone (no login, no new logs)
+     right away;
+  2. purge: each dependent table is emptied for that user CHUNK_SIZE rows
+     per transaction, so other writers get the lock between chunks;
+  3. the queue row is dropped once every table is clear.
+An interrupted purge resumes from purge_queue. Afterwards the freed pages
+are returned to the OS with incremental vacuum (when auto_vacuum is
+INCREMENTAL; see enable_incremental_vacuum).
+"""
+import time
+from sqlite3 import Connection
+from typing import Callable, Dict, Iterable, List, Optional
+
+CHUNK_SIZE = 2000
+CHUNK_PAUSE = 0.005     # seconds between chunks, for other writers
+VACUUM_PAGES = 500      # pages released per incremental_vacuum step
+
+# (table, statement deleting up to :limit of :uid's rows); rollups first so
+# the user's charts empty out before the raw logs are gone
+DEPENDENT_TABLES = [
+    ("daily_totals", "DELETE FROM daily_totals WHERE user_id = :uid AND date IN "
+                     "(SELECT date FROM daily_totals WHERE user_id = :uid LIMIT :limit)"),
+    ("user_streaks", "DELETE FROM user_streaks WHERE user_id = :uid"),
+    ("user_metrics", "DELETE FROM user_metrics WHERE user_id = :uid"),
+    ("water_logs", "DELETE FROM water_logs WHERE rowid IN "
+                   "(SELECT rowid FROM water_logs WHERE user_id = :uid LIMIT :limit)"),
+    ("food_logs", "DELETE FROM food_logs WHERE id IN "
+                  "(SELECT id FROM food_logs WHERE user_id = :uid LIMIT :limit)"),
+]
+
+Progress = Callable[[int, str, int], None]   # (user_id, table, rows deleted so far in that table)
+
+
+def _begin(conn: Connection):
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def enqueue_purge(conn: Connection, user_ids: Iterable[int]) -> List[int]:
+    """
+    Queue users for purging and delete their account rows, in one short
+    transaction. Returns the ids that existed (or were already queued).
+    """
+    queued = []
+    _begin(conn)
+    try:
+        for user_id in user_ids:
+            row = conn.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+            if row is None:
+                if conn.execute("SELECT 1 FROM purge_queue WHERE user_id = ?", (user_id,)).fetchone():
+                    queued.append(user_id)
+                continue
+            conn.execute("INSERT OR IGNORE INTO purge_queue (user_id, username) VALUES (?, ?)", (user_id, row[0]))
+            conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            queued.append(user_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return queued
+
+
+def purge_user_rows(conn: Connection, user_id: int, chunk_size: int = CHUNK_SIZE,
+                    progress: Optional[Progress] = None, pause: float = CHUNK_PAUSE) -> Dict[str, int]:
+    """Empty every dependent table for one queued user, chunk by chunk. Returns rows deleted per table."""
+    deleted = {}
+    for table, sql in DEPENDENT_TABLES:
+        deleted[table] = 0
+        while True:
+            _begin(conn)
+            try:
+                n = conn.execute(sql, {"uid": user_id, "limit": chunk_size}).rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            deleted[table] += n
+            if progress is not None and n:
+                progress(user_id, table, deleted[table])
+            if n < chunk_size:
+                break
+            time.sleep(pause)
+    conn.execute("DELETE FROM purge_queue WHERE user_id = ?", (user_id,))
+    conn.commit()
+    return deleted
+
+
+def pending_purges(conn: Connection) -> List[int]:
+    return [row[0] for row in conn.execute("SELECT user_id FROM purge_queue ORDER BY requested_at, user_id")]
+
+
+def run_purge_queue(conn: Connection, chunk_size: int = CHUNK_SIZE, progress: Optional[Progress] = None,
+                    vacuum: bool = True, on_user_done: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, int]:
+    """
+    Purge every queued user (oldest request first), then run incremental
+    vacuum. on_user_done(user_id, done, total) is called after each user.
+    Returns total rows deleted per table plus "users" and "pages_freed".
+    """
+    pending = pending_purges(conn)
+    totals = {table: 0 for table, _ in DEPENDENT_TABLES}
+    for done, user_id in enumerate(pending, 1):
+        for table, n in purge_user_rows(conn, user_id, chunk_size, progress).items():
+            totals[table] += n
+        if on_user_done is not None:
+            on_user_done(user_id, done, len(pending))
+    totals["users"] = len(pending)
+    totals["pages_freed"] = incremental_vacuum(conn) if vacuum and pending else 0
+    return totals
+
+
+def purge_user(conn: Connection, user_id: int, chunk_size: int = CHUNK_SIZE,
+               progress: Optional[Progress] = None, vacuum: bool = True) -> Dict[str, int]:
+    """
+    Enqueue and fully purge one user, then run incremental vacuum (what
+    db.delete_user does). Returns rows deleted per table plus "pages_freed".
+    """
+    enqueue_purge(conn, [user_id])
+    totals = purge_user_rows(conn, user_id, chunk_size, progress)
+    totals["pages_freed"] = incremental_vacuum(conn) if vacuum else 0
+    return totals
+
+
+# ---------------------------
+# Space reclamation
+# ---------------------------
+def auto_vacuum_mode(conn: Connection) -> int:
+    """0 = NONE, 1 = FULL, 2 = INCREMENTAL."""
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def incremental_vacuum(conn: Connection, pages_per_step: int = VACUUM_PAGES, pause: float = CHUNK_PAUSE) -> int:
+    """
+    Release free pages in small steps (each its own short write). Returns
+    pages freed; 0 if the database is not in INCREMENTAL mode.
+    """
+    if auto_vacuum_mode(conn) != 2:
+        return 0
+    if conn.in_transaction:
+        conn.commit()
+    freed = 0
+    while True:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free == 0:
+            return freed
+        conn.execute(f"PRAGMA incremental_vacuum({min(free, pages_per_step)})").fetchall()
+        freed += min(free, pages_per_step)
+        time.sleep(pause)
+
+
+def enable_incremental_vacuum(conn: Connection):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL. This needs one
+    full VACUUM (rewrites the file, blocks writers); run it in a quiet window.
+    New databases get INCREMENTAL from db_pool.PRAGMAS.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
@@ -0,0 +1,277 @@
+# resolver.py
+"""
+Nutrient lookup across ordered, pluggable sources.
+
+A NutrientResolver walks its sources in priority order; the first source
+that answers confidently wins. In-process sources (the catalog, dicts,
+CSVs) are called directly on the caller's thread: they are never timed
+out, so a cold catalog load delays a lookup instead of turning it into an
+estimate. Remote sources are started together on a shared thread pool up
+front, and one that misses its timeout is skipped (the resolution is then
+marked incomplete). Per-source call counts, hit rates, timeouts and
+latency percentiles are kept in stats().
+
+    python resolver.py apple "white rice" --csv nutrition.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Sequence
+
+from constant import NUTRITION_DB_FILE
+from food_catalog import NUTRIENT_KEYS, get_catalog, normalize_name
+
+logger = logging.getLogger("NutriAI.Resolver")
+
+DEFAULT_TIMEOUT = 0.25      # seconds a single remote source may take
+DEFAULT_DEADLINE = 1.0      # seconds for the remote sources of a whole resolve()
+MAX_WORKERS = 8
+LATENCY_SAMPLES = 1000      # recent latencies kept per source for percentiles
+
+ESTIMATE = {"calories": 100, "carbs": 20, "protein": 5, "fat": 3, "fiber": 2}
+
+
+class NutrientSource:
+    """
+    One tier of the lookup chain. lookup() returns per-100g nutrients or
+    None. Non-confident sources (estimates) only win when nothing else answers.
+    Remote sources run on the resolver's pool under `timeout`; the others
+    are called inline.
+    """
+    name = "source"
+    confident = True
+    remote = False
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+
+    def lookup(self, food_name: str) -> Optional[Dict[str, float]]:
+        raise NotImplementedError
+
+
+class CatalogSource(NutrientSource):
+    """The sqlite catalog (foods table) through the shared in-memory FoodCatalog."""
+    name = "catalog"
+
+    def __init__(self, db_path: str = NUTRITION_DB_FILE, timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(timeout)
+        self.catalog = get_catalog(db_path)
+
+    def lookup(self, food_name):
+        return self.catalog.get(food_name)
+
+
+class DictSource(NutrientSource):
+    """Exact (normalized) name lookup in a dict of per-100g values."""
+    name = "dict"
+
+    def __init__(self, table: Dict[str, Dict[str, float]], timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(timeout)
+        self.table = {normalize_name(k): v for k, v in table.items()}
+
+    def lookup(self, food_name):
+        n = self.table.get(normalize_name(food_name))
+        return {k: n.get(k, 0) for k in NUTRIENT_KEYS} if n else None
+
+
+class CSVSource(DictSource):
+    """A name,calories,carbs,protein,fat,fiber CSV, read once on first lookup."""
+    name = "csv"
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT):
+        NutrientSource.__init__(self, timeout)
+        self.path = path
+        self.table = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        table = {}
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                name = normalize_name(row.get("name") or "")
+                if name and name not in table:
+                    table[name] = {k: float(row.get(k) or 0) for k in NUTRIENT_KEYS}
+        return table
+
+    def lookup(self, food_name):
+        with self._lock:
+            if self.table is None:
+                self.table = self._load()
+        return super().lookup(food_name)
+
+
+class HTTPSource(NutrientSource):
+    """
+    A remote nutrient service answering GET <base_url>/foods?name=... with
+    {"name": ..., "nutrients": {...}} (server.py serves this for its catalog).
+    """
+    name = "http"
+    remote = True
+
+    def __init__(self, base_url: str, timeout: float = DEFAULT_TIMEOUT):
+        super().__init__(timeout)
+        self.base_url = base_url.rstrip("/")
+
+    def lookup(self, food_name):
+        import urllib.error  # only needed once a remote tier is configured
+        import urllib.parse
+        import urllib.request
+
+        url = f"{self.base_url}/foods?{urllib.parse.urlencode({'name': food_name})}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                payload = json.load(resp)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+        return {k: float(payload["nutrients"].get(k, 0)) for k in NUTRIENT_KEYS}
+
+
+class EstimateSource(NutrientSource):
+    """Fixed conservative estimate; always answers, never confident."""
+    name = "estimate"
+    confident = False
+
+    def lookup(self, food_name):
+        return dict(ESTIMATE)
+
+
+class SourceStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = self.hits = self.misses = self.timeouts = self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, latency_ms: float, hit: Optional[bool]):
+        with self.lock:
+            self.calls += 1
+            self.latencies.append(latency_ms)
+            if hit is None:
+                self.errors += 1
+            elif hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            ordered = sorted(self.latencies)
+            pct = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3) if ordered else None
+            return {"calls": self.calls, "hits": self.hits, "misses": self.misses, "errors": self.errors,
+                    "timeouts": self.timeouts, "hit_rate": round(self.hits / self.calls, 3) if self.calls else None,
+                    "p50_ms": pct(0.5), "p99_ms": pct(0.99)}
+
+
+class IncompleteResolution(Exception):
+    """A lookup whose answer may be wrong because a higher-priority source timed out or failed."""
+
+
+class Resolution:
+    def __init__(self, nutrients: Dict[str, float], source: str, estimated: bool, complete: bool):
+        self.nutrients = nutrients
+        self.source = source
+        self.estimated = estimated
+        # False if a higher-priority source timed out or failed: the answer may differ next time
+        self.complete = complete
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="nutriai-resolver")
+
+
+class NutrientResolver:
+    def __init__(self, sources: Sequence[NutrientSource], deadline: float = DEFAULT_DEADLINE):
+        self.sources = list(sources)
+        names = [source.name for source in self.sources]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            # stats are per name; give each instance its own, e.g. source.name = "csv-local"
+            raise ValueError(f"Duplicate nutrient source name(s): {', '.join(duplicates)}")
+        self.deadline = deadline
+        self._stats = {source.name: SourceStats() for source in self.sources}
+
+    def _call(self, source: NutrientSource, food_name: str):
+        stats = self._stats[source.name]
+        start = time.perf_counter()
+        try:
+            result = source.lookup(food_name)
+        except Exception:
+            stats.record((time.perf_counter() - start) * 1000, None)
+            raise
+        stats.record((time.perf_counter() - start) * 1000, bool(result))
+        return result
+
+    def resolve(self, food_name: str) -> Resolution:
+        """
+        Return the highest-priority confident answer, falling back to the
+        best non-confident one. Remote sources must answer within their
+        timeout and the overall deadline; in-process ones are always waited for.
+        """
+        end = time.monotonic() + self.deadline
+        # remote lookups start together so their latency overlaps the local ones
+        futures = {id(source): _executor.submit(self._call, source, food_name)
+                   for source in self.sources if source.remote}
+        complete = True
+        fallback = None
+        try:
+            for source in self.sources:
+                try:
+                    if source.remote:
+                        future = futures[id(source)]
+                        result = future.result(timeout=max(0.0, min(source.timeout, end - time.monotonic())))
+                    else:
+                        result = self._call(source, food_name)
+                except FutureTimeout:
+                    with self._stats[source.name].lock:
+                        self._stats[source.name].timeouts += 1
+                    complete = False
+                    continue
+                except Exception as e:
+                    logger.warning("%s lookup failed for '%s': %s", source.name, food_name, e)
+                    complete = False
+                    continue
+                if not result:
+                    continue
+                if source.confident:
+                    return Resolution(result, source.name, False, complete)
+                if fallback is None:
+                    fallback = Resolution(result, source.name, True, complete)
+            return fallback or Resolution(dict(ESTIMATE), "estimate", True, complete)
+        finally:
+            for future in futures.values():
+                future.cancel()  # lower tiers nobody needs any more
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Resolve foods through the nutrient sources")
+    parser.add_argument("foods", nargs="+")
+    parser.add_argument("--catalog-db", default=NUTRITION_DB_FILE)
+    parser.add_argument("--csv", default=None, help="also look in this CSV")
+    parser.add_argument("--http", default=None, metavar="URL", help="also ask this nutrient service")
+    args = parser.parse_args(argv)
+
+    sources: List[NutrientSource] = [CatalogSource(args.catalog_db)]
+    if args.csv:
+        sources.append(CSVSource(args.csv))
+    if args.http:
+        sources.append(HTTPSource(args.http))
+    sources.append(EstimateSource())
+    resolver = NutrientResolver(sources)
+    for food in args.foods:
+        r = resolver.resolve(food)
+        print(f"{food}: {r.nutrients} (from {r.source}{', estimated' if r.estimated else ''})")
+    print(json.dumps(resolver.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# scoring_job.py
+"""
+Nightly batch job: score every user into the user_metrics table.
+
+    python scoring_job.py [--db PATH] [--chunk-size 5000] [--workers 4]
+
+Users are split into id ranges. Each worker process reads its range with
+two set-based queries (profiles, daily_totals) and scores it with the
+vectorized rules in analytics.py; the parent process writes each chunk's
+results in its own short transaction.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple
+
+import pandas as pd
+
+from analytics import PROFILE_COLUMNS, calorie_goals, compute_metrics
+from constant import DB_FILE
+from db import connect_to_db
+
+CHUNK_SIZE = 5000
+
+METRIC_COLUMNS = ["calorie_goal", "days_logged", "current_streak", "longest_streak",
+                  "avg_calories", "avg_carbs", "avg_protein", "avg_fat",
+                  "goal_hit_days", "goal_adherence"]
+
+
+def user_id_ranges(conn, chunk_size: int) -> List[Tuple[int, int]]:
+    """Inclusive (first_id, last_id) ranges of about chunk_size users each."""
+    ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+    return [(ids[i], ids[min(i + chunk_size, len(ids)) - 1]) for i in range(0, len(ids), chunk_size)]
+
+
+def score_range(db_file: str, first_id: int, last_id: int) -> List[tuple]:
+    """Metrics rows (user_id, *METRIC_COLUMNS) for users with first_id <= id <= last_id."""
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_file)}?mode=ro", uri=True)
+    try:
+        profiles = pd.read_sql_query(
+            f"SELECT {', '.join(PROFILE_COLUMNS)} FROM users WHERE id BETWEEN ? AND ?",
+            conn, params=(first_id, last_id)).set_index("id")
+        daily = pd.read_sql_query(
+            "SELECT user_id, date AS Date, calories AS Calories, carbs AS Carbs, protein AS Protein, fat AS Fat "
+            "FROM daily_totals WHERE user_id BETWEEN ? AND ?",
+            conn, params=(first_id, last_id))
+    finally:
+        conn.close()
+
+    goals = calorie_goals(profiles)
+    scored = pd.DataFrame(index=profiles.index)
+    if not daily.empty:
+        scored = scored.join(compute_metrics(daily, goals))
+    scored["calorie_goal"] = goals
+    for col in ("days_logged", "current_streak", "longest_streak", "goal_hit_days"):
+        scored[col] = scored[col].fillna(0).astype(int) if col in scored else 0
+    scored = scored.reindex(columns=METRIC_COLUMNS)
+    # plain Python values for sqlite; NaN averages become NULL
+    scored = scored.astype(object).where(scored.notna(), None)
+    return [(int(uid), *values) for uid, values in zip(scored.index, scored.itertuples(index=False))]
+
+
+def write_metrics(conn, rows: List[tuple]):
+    placeholders = ", ".join("?" * (len(METRIC_COLUMNS) + 1))
+    try:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO user_metrics (user_id, {', '.join(METRIC_COLUMNS)}) VALUES ({placeholders})",
+            rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run(db_file: str = DB_FILE, chunk_size: int = CHUNK_SIZE, workers: int = None) -> int:
+    """Score all users; returns the number of users written."""
+    conn = connect_to_db(db_file)  # also brings the schema up to date
+    ranges = user_id_ranges(conn, chunk_size)
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(score_range, db_file, lo, hi) for lo, hi in ranges]
+        for done, future in enumerate(as_completed(futures), 1):
+            rows = future.result()
+            write_metrics(conn, rows)
+            written += len(rows)
+            print(f"[INFO] chunk {done}/{len(ranges)}: {written} users scored")
+    # users deleted since the last run
+    conn.execute("DELETE FROM user_metrics WHERE user_id NOT IN (SELECT id FROM users)")
+    conn.commit()
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compute user_metrics for every user")
+    parser.add_argument("--db", default=DB_FILE, help="tracker database file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    written = run(args.db, args.chunk_size, args.workers)
+    print(f"Scored {written} users in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+# server.py
+"""
+Headless HTTP/JSON API over the tracker, for mobile clients.
+
+    python server.py [--host 127.0.0.1] [--port 8080] [--workers 8] [--max-concurrent 64] [--write-behind]
+
+Stdlib only: asyncio handles the sockets and every sqlite call runs on a
+thread pool, each worker thread using its own pooled connection. At most
+`max_concurrent` requests are handled at once; a request that waits longer
+than QUEUE_TIMEOUT for a slot gets 503. With --write-behind, POST /logs
+rows are group-committed by write_behind.py; the response waits for the
+commit unless the request has ?wait=0 (then "id" is null).
+
+    POST /login     {"username", "password"}           -> {"token", "user_id", "username", "is_admin"}
+    POST /logout
+    POST /logs      {"food_name", "quantity", "date", "meal_type"} -> {"id", "estimated"}
+    GET  /logs      ?limit=&after_date=&after_id=&start=&end=&meal=
+    GET  /plot      daily totals
+    GET  /goal      predicted calorie goal
+    GET  /streak    current and longest streak
+    GET  /foods     ?name=  per-100g nutrients of the best catalog match
+    GET  /metrics   Prometheus text (?format=json for JSON)
+    GET  /health
+
+Everything except /login, /foods, /metrics and /health needs "Authorization: Bearer <token>".
+"""
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from constant import DB_FILE, NUTRITION_DB_FILE
+from db import (borrow_connection, fetch_past_logs_for_plot, get_user_streaks, login_user,
+                predict_calorie_goal, view_past_logs_page)
+from db_pool import MAX_CONNECTIONS
+from instrumentation import export_json, export_prometheus
+from nutrition import log_food, queue_log_food
+from resolver import IncompleteResolution
+from usda_api import USDANutritionAPI
+from write_behind import shutdown_write_behind
+
+logger = logging.getLogger("NutriAI.Server")
+
+SESSION_TTL = 12 * 3600     # seconds a login token stays valid
+MAX_CONCURRENT = 64         # requests handled at once
+QUEUE_TIMEOUT = 5.0         # seconds a request may wait for a free slot
+MAX_BODY = 64 * 1024        # bytes; larger bodies get 413
+MAX_HEADERS = 100
+MAX_PAGE = 500
+KEEPALIVE_TIMEOUT = 30.0
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+               503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+        self.session: Optional[dict] = None
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return data
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class SessionStore:
+    """Bearer tokens issued at login. Only touched from the event loop thread."""
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._sessions: Dict[str, dict] = {}
+
+    def create(self, user_id: int, username: str, is_admin: bool) -> str:
+        token = secrets.token_urlsafe(32)
+        self._sessions[token] = {"user_id": user_id, "username": username, "is_admin": is_admin,
+                                 "expires": time.monotonic() + self.ttl}
+        return token
+
+    def get(self, token: str) -> Optional[dict]:
+        session = self._sessions.get(token)
+        if session is not None and session["expires"] < time.monotonic():
+            del self._sessions[token]
+            return None
+        return session
+
+    def drop(self, token: str):
+        self._sessions.pop(token, None)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        for token in [t for t, s in self._sessions.items() if s["expires"] < now]:
+            del self._sessions[token]
+
+
+class TrackerServer:
+    def __init__(self, db_file: str = DB_FILE, catalog_db: str = NUTRITION_DB_FILE,
+                 host: str = "127.0.0.1", port: int = 8080, workers: int = MAX_CONNECTIONS,
+                 max_concurrent: int = MAX_CONCURRENT, queue_timeout: float = QUEUE_TIMEOUT,
+                 write_behind: bool = False):
+        self.db_file = db_file
+        self.write_behind = write_behind
+        self.host = host
+        self.port = port
+        self.queue_timeout = queue_timeout
+        self.max_concurrent = max_concurrent
+        self.sessions = SessionStore()
+        self.usda_api = USDANutritionAPI(catalog_db)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nutriai-api")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.routes: Dict[Tuple[str, str], Tuple[Callable, bool]] = {
+            ("GET", "/health"): (self.health, False),
+            ("POST", "/login"): (self.login, False),
+            ("POST", "/logout"): (self.logout, True),
+            ("POST", "/logs"): (self.add_log, True),
+            ("GET", "/logs"): (self.list_logs, True),
+            ("GET", "/plot"): (self.plot, True),
+            ("GET", "/goal"): (self.goal, True),
+            ("GET", "/streak"): (self.streak, True),
+            ("GET", "/foods"): (self.food, False),
+            ("GET", "/metrics"): (self.metrics, False),
+        }
+
+    # --- lifecycle ---
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Listening on http://%s:%d", self.host, self.port)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=True)
+        if self.write_behind:
+            shutdown_write_behind()
+
+    async def run_db(self, fn: Callable, *args):
+        """fn(conn, *args) on a worker thread, with a connection borrowed for the call."""
+        def call():
+            with borrow_connection(self.db_file) as conn:
+                return fn(conn, *args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    # --- HTTP plumbing ---
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            raise HTTPError(400, "request line too long")
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        for _ in range(MAX_HEADERS + 1):
+            try:
+                line = await reader.readline()
+            except ValueError:  # longer than the stream limit
+                raise HTTPError(400, "header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(400, "too many headers")
+        raw_length = headers.get("content-length") or "0"
+        # digits only: int() would also take "-1", "+5" or "1_000"
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            raise HTTPError(400, "invalid Content-Length")
+        length = int(raw_length)
+        if length > MAX_BODY:
+            raise HTTPError(413, f"request body too large (max {MAX_BODY} bytes)")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool,
+                        extra_headers: Optional[Dict[str, str]] = None):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload, default=str).encode("utf-8"), "application/json"
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body)),
+                   "Connection": "keep-alive" if keep_alive else "close", **(extra_headers or {})}
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    self._write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, payload, headers = await self._dispatch(request)
+                self._write_response(writer, status, payload, request.keep_alive, headers)
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: Request) -> Tuple[int, Any, Optional[Dict[str, str]]]:
+        route = self.routes.get((request.method, request.path))
+        if route is None:
+            if any(path == request.path for _, path in self.routes):
+                return 405, {"error": "method not allowed"}, None
+            return 404, {"error": "not found"}, None
+        handler, needs_auth = route
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return 503, {"error": "server busy"}, {"Retry-After": "1"}
+        try:
+            if needs_auth:
+                request.session = self._authenticate(request)
+            return 200, await handler(request), None
+        except HTTPError as e:
+            return e.status, {"error": e.message}, None
+        except IncompleteResolution as e:
+            return 503, {"error": str(e)}, {"Retry-After": "1"}
+        except ValueError as e:
+            return 400, {"error": str(e)}, None
+        except Exception:
+            logger.exception("%s %s failed", request.method, request.path)
+            return 500, {"error": "internal error"}, None
+        finally:
+            self._slots.release()
+
+    def _authenticate(self, request: Request) -> dict:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        session = self.sessions.get(token.strip()) if scheme.lower() == "bearer" else None
+        if session is None:
+            raise HTTPError(401, "missing or expired token")
+        return session
+
+    # --- endpoints ---
+
+    async def health(self, request: Request):
+        return {"status": "ok"}
+
+    async def login(self, request: Request):
+        data = request.json()
+        username, password = data.get("username"), data.get("password")
+        if not isinstance(username, str) or not isinstance(password, str):
+            raise HTTPError(400, "username and password are required")
+        user = await self.run_db(login_user, username, password)
+        if user is None:
+            raise HTTPError(401, "invalid username or password")
+        self.sessions.purge_expired()
+        user_id, username, is_admin = user
+        return {"token": self.sessions.create(user_id, username, is_admin),
+                "user_id": user_id, "username": username, "is_admin": is_admin}
+
+    async def logout(self, request: Request):
+        self.sessions.drop(request.headers["authorization"].partition(" ")[2].strip())
+        return {"status": "ok"}
+
+    async def add_log(self, request: Request):
+        data = request.json()
+        food_name = str(data.get("food_name") or "").strip()
+        if not food_name:
+            raise HTTPError(400, "food_name is required")
+        try:
+            quantity = float(data.get("quantity"))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "quantity must be a number")
+        if quantity <= 0:
+            raise HTTPError(400, "quantity must be positive")
+        date_str = str(data.get("date") or time.strftime("%Y-%m-%d"))
+        meal_type = str(data.get("meal_type") or "Snack")
+        if self.write_behind:
+            loop = asyncio.get_running_loop()
+            estimated, future = await loop.run_in_executor(
+                self._executor, queue_log_food, request.session["user_id"], food_name, quantity,
+                date_str, meal_type, self.usda_api, self.db_file)
+            if request.query.get("wait") == "0":
+                return {"id": None, "estimated": estimated}
+            return {"id": await asyncio.wrap_future(future), "estimated": estimated}
+        estimated, row_id = await self.run_db(log_food, request.session["user_id"], food_name, quantity,
+                                              date_str, meal_type, self.usda_api)
+        return {"id": row_id, "estimated": estimated}
+
+    async def list_logs(self, request: Request):
+        q = request.query
+        try:
+            limit = min(MAX_PAGE, max(1, int(q.get("limit", 100))))
+            after = (q["after_date"], int(q["after_id"])) if "after_date" in q and "after_id" in q else None
+        except ValueError:
+            raise HTTPError(400, "limit and after_id must be integers")
+        rows, next_cursor = await self.run_db(view_past_logs_page, request.session["user_id"], limit, after,
+                                              q.get("start"), q.get("end"), q.get("meal"))
+        keys = ("date", "food_name", "quantity", "carbs", "calories", "protein", "fat")
+        return {"logs": [dict(zip(keys, row)) for row in rows],
+                "next": {"after_date": next_cursor[0], "after_id": next_cursor[1]} if next_cursor else None}
+
+    async def plot(self, request: Request):
+        df = await self.run_db(fetch_past_logs_for_plot, request.session["user_id"])
+        return {"days": df.assign(Date=df["Date"].astype(str)).to_dict("records")}
+
+    async def goal(self, request: Request):
+        return {"calorie_goal": await self.run_db(predict_calorie_goal, request.session["user_id"])}
+
+    async def streak(self, request: Request):
+        current, longest = await self.run_db(get_user_streaks, request.session["user_id"])
+        return {"current_streak": current, "longest_streak": longest}
+
+    async def food(self, request: Request):
+        name = request.query.get("name", "").strip()
+        if not name:
+            raise HTTPError(400, "name is required")
+        catalog = self.usda_api.catalog
+
+        def lookup():
+            # both calls may reload the catalog; keep that off the event loop
+            match = catalog.best_match(name)
+            return match, catalog.get(match) if match is not None else None
+
+        loop = asyncio.get_running_loop()
+        match, nutrients = await loop.run_in_executor(self._executor, lookup)
+        if match is None:
+            raise HTTPError(404, f"no food matching {name!r}")
+        return {"name": match, "nutrients": nutrients}
+
+    async def metrics(self, request: Request):
+        if request.query.get("format") == "json":
+            return export_json()
+        return export_prometheus()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the tracker API over HTTP/JSON")
+    parser.add_argument("--db", default=DB_FILE, help="tracker database file")
+    parser.add_argument("--catalog-db", default=NUTRITION_DB_FILE, help="nutrition catalog database file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=MAX_CONNECTIONS,
+                        help=f"sqlite worker threads (at most {MAX_CONNECTIONS}, the pool size)")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT)
+    parser.add_argument("--write-behind", action="store_true",
+                        help="group-commit POST /logs through a single writer thread")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # SIGTERM unwinds like Ctrl+C, so close() still flushes write-behind rows
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server = TrackerServer(args.db, args.catalog_db, args.host, args.port,
+                           min(args.workers, MAX_CONNECTIONS), args.max_concurrent,
+                           write_behind=args.write_behind)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
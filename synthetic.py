@@ -0,0 +1,165 @@
+# synthetic.py
+"""
+Seeded synthetic workload: users, food/water logs and a food catalog.
+
+    python synthetic.py --db /tmp/tracker.db --catalog-db /tmp/catalog.db \
+        --users 1000 --logs 200000 --foods 10000 --days 365 --seed 42
+
+The same arguments always produce the same databases. Every user's
+password is SYNTHETIC_PASSWORD and usernames are user0..userN-1.
+Never point this at the real database files.
+"""
+import argparse
+import math
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from db import FOOD_UPSERT, rebuild_daily_totals
+from migrations import migrate, migrate_catalog
+from nutrition import FOOD_DATABASE
+from utils import generate_salt, hash_password
+
+SYNTHETIC_PASSWORD = "secret"
+BATCH = 10_000
+
+ACTIVITY_LEVELS = [("sedentary", 30), ("light", 30), ("moderate", 25), ("active", 10), ("very active", 5)]
+WEIGHT_GOALS = [("lose", 50), ("maintain", 35), ("gain", 15)]
+# (meal, share of entries, typical portion in grams)
+MEALS = [("Breakfast", 25, 150), ("Lunch", 30, 250), ("Dinner", 30, 300), ("Snack", 15, 80)]
+
+_ADJECTIVES = ["raw", "boiled", "baked", "grilled", "fried", "steamed", "roasted", "dried", "canned",
+               "frozen", "smoked", "organic", "low fat", "whole", "sliced", "mashed"]
+_BASES = list(FOOD_DATABASE) + ["tomato", "cucumber", "lettuce", "onion", "garlic", "mushroom", "pepper",
+                                "pork chop", "turkey breast", "tuna", "shrimp", "tofu", "tempeh", "beans",
+                                "corn", "peas", "rice noodles", "bagel", "croissant", "granola", "muesli",
+                                "honey", "butter", "cream cheese", "ice cream", "pizza", "burger", "sushi"]
+_STYLES = ["", "with salt", "with sauce", "homemade", "restaurant style", "mixed", "plain", "seasoned"]
+
+
+def _weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def make_foods(k: int, rng: random.Random) -> List[tuple]:
+    """k distinct (name, calories, carbs, protein, fat, fiber) rows per 100 g, FOOD_DATABASE first."""
+    rows = [(name, n["calories"], n["carbs"], n["protein"], n["fat"], n.get("fiber", 0))
+            for name, n in FOOD_DATABASE.items()][:k]
+    seen = {row[0] for row in rows}
+    while len(rows) < k:
+        name = " ".join(w for w in (rng.choice(_ADJECTIVES), rng.choice(_BASES), rng.choice(_STYLES)) if w)
+        if len(seen) > 0.8 * len(_ADJECTIVES) * len(_BASES) * len(_STYLES):
+            name = f"{name} {len(rows)}"  # combinations exhausted; number the rest
+        if name in seen:
+            continue
+        seen.add(name)
+        carbs, protein, fat = rng.uniform(0, 60), rng.uniform(0, 30), rng.uniform(0, 30)
+        calories = round(4 * carbs + 4 * protein + 9 * fat, 1)
+        rows.append((name, calories, round(carbs, 1), round(protein, 1), round(fat, 1), round(rng.uniform(0, 8), 1)))
+    return rows
+
+
+def make_user(i: int, rng: random.Random, pwd_hash: str, salt_hex: str) -> tuple:
+    gender = rng.choice(["male", "female"])
+    height = rng.gauss(177 if gender == "male" else 164, 7)
+    weight = max(40.0, rng.gauss(24.5, 4) * (height / 100) ** 2)  # BMI ~ N(24.5, 4)
+    goal = _weighted(rng, WEIGHT_GOALS)
+    goal_weight = weight + {"lose": -rng.uniform(3, 15), "maintain": 0, "gain": rng.uniform(2, 8)}[goal]
+    return (f"user{i}", pwd_hash, salt_hex, rng.randint(18, 75), gender, round(height, 1), round(weight, 1),
+            round(goal_weight, 1), _weighted(rng, ACTIVITY_LEVELS), goal)
+
+
+def generate(db_file: str, catalog_db: Optional[str] = None, users: int = 1000, logs: int = 100_000,
+             foods: int = 5000, days: int = 365, end: Optional[date] = None, seed: int = 42) -> Dict[str, int]:
+    """
+    Fill db_file (and catalog_db) with a deterministic workload. Food
+    popularity is Zipf-like and user activity is log-normal, so a few foods
+    and users dominate as in real traffic. Returns row counts.
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    food_rows = make_foods(foods, rng)
+
+    if catalog_db:
+        cat = sqlite3.connect(catalog_db)
+        migrate_catalog(cat)
+        cat.executemany(FOOD_UPSERT, food_rows)
+        cat.commit()
+        cat.close()
+
+    conn = sqlite3.connect(db_file)
+    migrate(conn)
+    # one KDF run shared by every account: hashing N passwords would dominate setup
+    pwd_hash, salt_hex = hash_password(SYNTHETIC_PASSWORD, generate_salt())
+    conn.executemany(
+        "INSERT INTO users (username, password_hash, salt, age, gender, height, weight, goal_weight, "
+        "activity_level, weight_goal) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [make_user(i, rng, pwd_hash, salt_hex) for i in range(users)])
+    first_id = conn.execute("SELECT MIN(id) FROM users WHERE username = 'user0'").fetchone()[0]
+    user_ids = list(range(first_id, first_id + users))
+
+    activity = [rng.lognormvariate(0, 1) for _ in user_ids]
+    food_weights = [1 / (rank + 1) for rank in range(len(food_rows))]  # Zipf, s = 1
+    meal_names = [m[0] for m in MEALS]
+    meal_weights = [m[1] for m in MEALS]
+    portions = {m[0]: m[2] for m in MEALS}
+
+    written = 0
+    while written < logs:
+        n = min(BATCH, logs - written)
+        batch = []
+        for user_id, food, meal in zip(rng.choices(user_ids, activity, k=n),
+                                       rng.choices(food_rows, food_weights, k=n),
+                                       rng.choices(meal_names, meal_weights, k=n)):
+            quantity = round(max(10.0, rng.gauss(portions[meal], portions[meal] / 3)))
+            ratio = quantity / 100
+            day = start + timedelta(days=int(days * math.sqrt(rng.random())))  # more recent days busier
+            batch.append((user_id, food[0], quantity, round(food[2] * ratio, 2), round(food[1] * ratio, 2),
+                          round(food[3] * ratio, 2), round(food[4] * ratio, 2), round(food[5] * ratio, 2),
+                          min(day, end).isoformat(), meal))
+        conn.executemany(
+            "INSERT INTO food_logs (user_id, food_name, quantity, carbs, calories, protein, fat, fiber, date, meal_type) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        written += n
+    conn.commit()
+
+    # water: each user logs on a random share of days
+    water = []
+    for user_id in user_ids:
+        share = rng.uniform(0.1, 0.9)
+        for d in range(days):
+            if rng.random() < share:
+                water.append((user_id, (start + timedelta(days=d)).isoformat(), rng.randint(1, 12)))
+    conn.executemany("INSERT OR IGNORE INTO water_logs (user_id, date, glasses) VALUES (?, ?, ?)", water)
+    conn.commit()
+
+    rebuild_daily_totals(conn)  # also fills user_streaks
+    conn.execute("ANALYZE")
+    conn.close()
+    return {"users": users, "food_logs": logs, "water_logs": len(water), "foods": len(food_rows)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic tracker workload")
+    parser.add_argument("--db", required=True, help="tracker database to create (not the real one)")
+    parser.add_argument("--catalog-db", default=None, help="also build a food catalog here")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=100_000)
+    parser.add_argument("--foods", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = generate(args.db, args.catalog_db, args.users, args.logs, args.foods, args.days, seed=args.seed)
+    print(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# tasks.py
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from db import borrow_connection
+
+logger = logging.getLogger("NutriAI.Tasks")
+
+POLL_MS = 30
+MAX_WORKERS = 4
+
+
+class Task:
+    """Handle for a submitted job. Cancelled tasks never call back into the UI."""
+
+    def __init__(self, on_done: Optional[Callable], on_error: Optional[Callable]):
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future: Optional[Future] = None
+        self.cancelled = False
+        self.owner_key: Optional[str] = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()  # only stops it if it has not started yet
+
+
+class TaskRunner:
+    """
+    Runs blocking db/nutrition calls on worker threads and hands results back
+    to the Tk thread. Workers never touch Tk: they put results on a queue that
+    the UI drains with root.after().
+    """
+
+    def __init__(self, root, max_workers: int = MAX_WORKERS, poll_ms: int = POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nutriai-worker")
+        self._results: "queue.Queue" = queue.Queue()
+        self._owned: Dict[str, List[Task]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, owner=None, **kwargs) -> Task:
+        """
+        Run fn(*args, **kwargs) off the UI thread; on_done(result) or
+        on_error(exc) then run on the UI thread. If `owner` (a Tk window) is
+        destroyed first, the task is cancelled and no callback runs.
+        """
+        task = Task(on_done, on_error)
+        if owner is not None:
+            self._track(owner, task)
+
+        def run():
+            if task.cancelled:
+                self._results.put((task, False, None))  # still reported, so _poll can untrack it
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._results.put((task, False, e))
+            else:
+                self._results.put((task, True, result))
+
+        task.future = self._executor.submit(run)
+        task.future.add_done_callback(self._on_future_done(task))
+        return task
+
+    def _on_future_done(self, task: Task) -> Callable[[Future], None]:
+        def done(future: Future):
+            if future.cancelled():  # never ran: report it so _poll can untrack it
+                task.cancelled = True
+                self._results.put((task, False, None))
+        return done
+
+    def submit_db(self, fn: Callable, *args, **kwargs) -> Task:
+        """submit() for db-style functions: fn(conn, *args) with a connection borrowed for the call."""
+        def call():
+            with borrow_connection() as conn:
+                return fn(conn, *args)
+
+        return self.submit(call, **kwargs)
+
+    def watch(self, future: Future, on_done: Optional[Callable] = None,
+              on_error: Optional[Callable] = None) -> Task:
+        """
+        Report a Future completed elsewhere (e.g. by the write-behind writer)
+        on the UI thread: on_done(result) or on_error(exc), like submit().
+        """
+        task = Task(on_done, on_error)
+
+        def finished(f: Future):
+            if f.cancelled():
+                return
+            error = f.exception()
+            self._results.put((task, error is None, f.result() if error is None else error))
+
+        future.add_done_callback(finished)
+        return task
+
+    def _track(self, owner, task: Task):
+        key = task.owner_key = str(owner)
+        with self._lock:
+            if key not in self._owned:
+                self._owned[key] = []
+                owner.bind("<Destroy>", lambda e, w=owner: self.cancel_owner(w) if e.widget is w else None, add="+")
+            self._owned[key].append(task)
+
+    def _untrack(self, task: Task):
+        # finished tasks leave their owner's list, so long-lived owners don't accumulate them
+        if task.owner_key is None:
+            return
+        with self._lock:
+            tasks = self._owned.get(task.owner_key)
+            if tasks is not None and task in tasks:
+                tasks.remove(task)
+
+    def cancel_owner(self, owner):
+        with self._lock:
+            tasks = self._owned.pop(str(owner), [])
+        for task in tasks:
+            task.cancel()
+
+    def _poll(self):
+        while True:
+            try:
+                task, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._untrack(task)
+            if task.cancelled:
+                continue
+            callback = task.on_done if ok else task.on_error
+            try:
+                if callback is not None:
+                    callback(value)
+                elif not ok:
+                    logger.error("Background task failed", exc_info=value)
+            except Exception:
+                logger.exception("Task callback failed")
+        if not self._closed:
+            self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self, wait: bool = False):
+        self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
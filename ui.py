@@ -1,24 +1,26 @@
 # ui.py
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, simpledialog
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+from tkinter import ttk, messagebox, scrolledtext, simpledialog, filedialog
 from datetime import date
+import base64
 import logging
 import random
-from food_search import search_foods
+from food_search import search_foods, warm_search_index
 
 # Project modules (must exist in your project)
-from constant import COLORS
+from charts import ChartUnavailable, get_chart_service
+from constant import COLORS, LOG_WRITE_BEHIND
 from db import (
-    connect_to_db, login_user, create_user, update_user_profile, view_past_logs,
-    fetch_past_logs_for_plot, get_user_data_for_ml, predict_calorie_goal,
-    get_all_users, get_user_streak, get_today_water, update_water,
+    login_user, create_user, update_user_profile, view_past_logs_page,
+    get_user_data_for_ml, get_users_page, USER_SORTS, get_today_water, update_water,
     set_admin_status, reset_user_password, delete_user
 )
+from export import export_logs
 from usda_api import USDANutritionAPI
-from nutrition import log_food
-from utils import is_number
+from nutrition import log_food, queue_log_food
+from tasks import TaskRunner
+from write_behind import shutdown_write_behind
+from utils import is_number, parse_date
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +30,15 @@ logger = logging.getLogger("NutriAI.UI")
 LIGHT_THEME = {"background": "#F9F9F9", "foreground": "#000000", "frame": "#FFFFFF"}
 DARK_THEME = {"background": "#1E1E1E", "foreground": "#FFFFFF", "frame": "#2C2C2C"}
 
+# (chart kind, tab title, size in pixels) for the analytics dashboard
+CHART_TABS = [
+    ("calories", "Calories vs Goal", (600, 400)),
+    ("macros", "Macronutrient Breakdown", (500, 500)),
+    ("weight", "Weight Progress", (600, 400)),
+    ("weekly", "Weekly Trends", (700, 400)),
+]
+RANGED_CHARTS = ("calories", "weight")  # follow the range selector
+
 
 class ModernNutritionTracker:
     """Refactored and modular UI for NutriAI."""
@@ -36,9 +47,12 @@ class ModernNutritionTracker:
         self.root = root
         self.root.title("🍎 NutriAI - Modern Nutrition Tracker")
         self.root.geometry("1000x700")
-        # DB / services
-        self.conn = connect_to_db()
+        # DB / services (db calls borrow pooled connections on the task runner;
+        # the schema is brought up to date by the first of them, off this thread)
         self.usda_api = USDANutritionAPI()
+        self.tasks = TaskRunner(self.root)
+        self.charts = get_chart_service()
+        warm_search_index()  # first keystroke in Log Food shouldn't build the index
 
         # session
         self.current_user_id = None
@@ -97,6 +111,36 @@ class ModernNutritionTracker:
         else:
             messagebox.showinfo(title, msg)
 
+    def run_db_task(self, fn, *args, on_done=None, on_error=None, owner=None):
+        """
+        Run fn(conn, *args) on a worker thread with a busy cursor on `owner`
+        (or the main window). Callbacks run on the UI thread; nothing runs if
+        `owner` is closed first.
+        """
+        target = owner or self.root
+        target.config(cursor="watch")
+
+        def finish(callback, value):
+            try:
+                target.config(cursor="")
+            except tk.TclError:
+                pass
+            if callback is not None:
+                callback(value)
+
+        def failed(e):
+            logger.error("Background task failed", exc_info=e)
+            self.show_message("Error", f"Operation failed: {e}", "error")
+
+        return self.tasks.submit_db(fn, *args, owner=owner,
+                                    on_done=lambda result: finish(on_done, result),
+                                    on_error=lambda e: finish(on_error or failed, e))
+
+    def show_loading(self, parent, text="Loading..."):
+        lbl = ttk.Label(parent, text=f"⏳ {text}")
+        lbl.pack(pady=50)
+        return lbl
+
     def clear_frame(self):
         for widget in self.main_frame.winfo_children():
             widget.destroy()
@@ -109,6 +153,8 @@ class ModernNutritionTracker:
 
     def exit_program(self):
         if messagebox.askokcancel("Exit", "Exit application?"):
+            self.tasks.shutdown()
+            shutdown_write_behind()  # commit any queued food logs before the process goes
             self.root.quit()
 
     # ---------------------------
@@ -170,16 +216,18 @@ class ModernNutritionTracker:
             if password != confirm:
                 self.show_message("Error", "Passwords do not match", "error")
                 return
-            try:
-                create_user(self.conn, username, password)
+            def on_created(_):
                 self.show_message("Success", "Account created successfully!")
                 win.destroy()
-            except Exception as e:
-                logger.exception("Signup failed")
+
+            def on_signup_error(e):
+                logger.error("Signup failed", exc_info=e)
                 self.show_message("Error", f"Sign up failed: {e}", "error")
+
+            # password hashing is slow on purpose; keep it off the UI thread
+            self.run_db_task(create_user, username, password, on_done=on_created, on_error=on_signup_error, owner=win)
         else:
-            try:
-                result = login_user(self.conn, username, password)
+            def on_login(result):
                 if result:
                     self.current_user_id, self.current_username, self.is_admin = result
                     self.show_message("Success", f"Welcome {self.current_username}!")
@@ -187,10 +235,13 @@ class ModernNutritionTracker:
                     self.show_dashboard()
                 else:
                     self.show_message("Error", "Invalid username or password", "error")
-            except Exception as e:
-                logger.exception("Login error")
+
+            def on_login_error(e):
+                logger.error("Login error", exc_info=e)
                 self.show_message("Error", f"Login failed: {e}", "error")
 
+            self.run_db_task(login_user, username, password, on_done=on_login, on_error=on_login_error, owner=win)
+
     # ---------------------------
     # Dashboard & components
     # ---------------------------
@@ -239,7 +290,8 @@ class ModernNutritionTracker:
         water_frame.pack(fill=tk.X, padx=20, pady=10)
 
         daily_goal = 8
-        current_glasses = get_today_water(self.conn, self.current_user_id) if self.current_user_id else 0
+        current_glasses = 0
+        saving = {"busy": False, "dirty": False}
         self.water_labels = []
 
         def refresh_display():
@@ -252,12 +304,32 @@ class ModernNutritionTracker:
                 lbl.grid(row=0, column=i, padx=5)
                 self.water_labels.append(lbl)
 
+        def save_water():
+            # one write in flight at a time, so the last click is the one that sticks
+            if saving["busy"]:
+                saving["dirty"] = True
+                return
+            saving["busy"] = True
+
+            def saved(_=None):
+                saving["busy"] = False
+                if saving["dirty"]:
+                    saving["dirty"] = False
+                    save_water()
+
+            def save_failed(e):
+                logger.error("Update water failed: %s", e)
+                saved()
+
+            self.run_db_task(update_water, int(self.current_user_id), current_glasses, owner=water_frame,
+                             on_done=saved, on_error=save_failed)
+
         def add_glass():
             nonlocal current_glasses
             if current_glasses < daily_goal:
                 current_glasses += 1
                 if self.current_user_id is not None:
-                    update_water(self.conn, int(self.current_user_id), current_glasses)
+                    save_water()
                 refresh_display()
 
         def remove_glass():
@@ -265,21 +337,61 @@ class ModernNutritionTracker:
             if current_glasses > 0:
                 current_glasses -= 1
                 if self.current_user_id is not None:
-                    update_water(self.conn, self.current_user_id, current_glasses)
+                    save_water()
                 refresh_display()
 
         btn_frame = ttk.Frame(water_frame)
         btn_frame.grid(row=1, column=0, columnspan=daily_goal, pady=5)
-        ttk.Button(btn_frame, text="➕ Add", command=add_glass, style="Modern.TButton").pack(side=tk.LEFT, padx=5)
-        ttk.Button(btn_frame, text="➖ Remove", command=remove_glass, style="Modern.TButton").pack(side=tk.LEFT, padx=5)
+        buttons = [
+            ttk.Button(btn_frame, text="➕ Add", command=add_glass, style="Modern.TButton"),
+            ttk.Button(btn_frame, text="➖ Remove", command=remove_glass, style="Modern.TButton"),
+        ]
+        for btn in buttons:
+            btn.pack(side=tk.LEFT, padx=5)
         refresh_display()
+        if not self.current_user_id:
+            return
+
+        def on_water(glasses):
+            nonlocal current_glasses
+            current_glasses = glasses
+            refresh_display()
+            for btn in buttons:
+                btn.state(["!disabled"])
+
+        def on_water_error(e):
+            logger.error("Get water failed: %s", e)
+            for btn in buttons:
+                btn.state(["!disabled"])
+
+        # clicks before today's count arrives would overwrite it
+        for btn in buttons:
+            btn.state(["disabled"])
+        self.run_db_task(get_today_water, self.current_user_id, owner=water_frame,
+                         on_done=on_water, on_error=on_water_error)
 
     def _build_achievements_section(self):
-        streak = get_user_streak(self.conn, self.current_user_id) if self.current_user_id else 0
-        ttk.Label(self.main_frame, text=f"🔥 Current Streak: {streak} days", font=("Arial", 12), foreground="orange").pack(pady=10)
-        achievements = self.get_achievements()
+        streak_label = ttk.Label(self.main_frame, text="🔥 Current Streak: ...", font=("Arial", 12), foreground="orange")
+        streak_label.pack(pady=10)
         self.achievements_section = AchievementsSection(self.main_frame)
-        self.achievements_section.display_achievements(achievements)
+        loading = self.show_loading(self.achievements_section.frame, "Loading achievements...")
+        if not self.current_user_id:
+            streak_label.config(text="🔥 Current Streak: 0 days")
+            loading.destroy()
+            return
+
+        def on_progress(progress):
+            loading.destroy()
+            streak_label.config(text=f"🔥 Current Streak: {progress['streak']} days")
+            self.achievements_section.display_achievements(self.get_achievements(progress))
+
+        def on_progress_error(e):
+            logger.error("Get achievements failed", exc_info=e)
+            loading.destroy()
+            self.achievements_section.display_achievements(self.get_achievements(None))
+
+        self.run_db_task(load_progress, self.current_user_id, on_done=on_progress,
+                         on_error=on_progress_error, owner=self.achievements_section.frame)
 
     def _build_tip_section(self):
         tip_frame = ttk.LabelFrame(self.main_frame, text="💡 Tip of the Day", padding=10)
@@ -321,33 +433,34 @@ class ModernNutritionTracker:
             self.profile_entries[key] = widget
 
         def save_profile():
-            try:
-                data = {}
-                for key, widget in self.profile_entries.items():
-                    val = widget.get()
-                    if key in ["age", "height", "weight", "goal_weight"] and val and not is_number(val):
-                        self.show_message("Invalid Input", f"Please enter a valid number for {key}.", "warn")
-                        return
-                    data[key] = float(val) if is_number(val) else val or None
-
-                if self.current_user_id is not None:
-                    update_user_profile(
-                        self.conn, int(self.current_user_id),
-                        data.get('age'), data.get('gender'),
-                        data.get('height'), data.get('weight'),
-                        data.get('goal_weight'),
-                        data.get('activity_level'), data.get('weight_goal')
-                    )
-                else:
-                    self.show_message("Error", "User ID is missing. Please log in again.", "error")
-                    win.destroy()
+            data = {}
+            for key, widget in self.profile_entries.items():
+                val = widget.get()
+                if key in ["age", "height", "weight", "goal_weight"] and val and not is_number(val):
+                    self.show_message("Invalid Input", f"Please enter a valid number for {key}.", "warn")
                     return
+                data[key] = float(val) if is_number(val) else val or None
+
+            if self.current_user_id is None:
+                self.show_message("Error", "User ID is missing. Please log in again.", "error")
+                win.destroy()
+                return
+
+            def on_saved(_):
                 self.show_message("Success", "Profile updated successfully!")
                 win.destroy()
-            except Exception as e:
-                logger.exception("Profile update failed")
+
+            def on_save_error(e):
+                logger.error("Profile update failed", exc_info=e)
                 self.show_message("Error", f"Failed to update profile: {e}", "error")
 
+            self.run_db_task(update_user_profile, int(self.current_user_id),
+                             data.get('age'), data.get('gender'),
+                             data.get('height'), data.get('weight'),
+                             data.get('goal_weight'),
+                             data.get('activity_level'), data.get('weight_goal'),
+                             owner=win, on_done=on_saved, on_error=on_save_error)
+
         btn_frame = ttk.Frame(form)
         btn_frame.grid(row=len(fields), column=0, columnspan=2, pady=14)
         ttk.Button(btn_frame, text="Save", command=save_profile, style="Modern.TButton").pack(side=tk.LEFT, padx=8)
@@ -361,7 +474,7 @@ class ModernNutritionTracker:
             self.show_message("Error", "You must be logged in to log food.", "error")
             return
 
-        win = self.create_window("Log Food", size="420x320")
+        win = self.create_window("Log Food", size="420x440")
         ttk.Label(win, text="Log Your Food", style='Title.TLabel').pack(pady=18)
         form = ttk.Frame(win)
         form.pack(padx=20, pady=8, fill=tk.BOTH, expand=True)
@@ -370,17 +483,29 @@ class ModernNutritionTracker:
         food_entry = ttk.Entry(form, width=30)
         food_entry.grid(row=0, column=1, padx=10, pady=5)
         
-        '''# ---- Food search suggestions ----
+        # ---- Food search suggestions ----
         suggestion_box = tk.Listbox(form, width=30, height=5, font=("Segoe UI", 9))
         suggestion_box.grid(row=1, column=1, padx=10, pady=2, sticky="w")
+        pending_search = [None]
+
+        def show_suggestions(query, suggestions):
+            if food_entry.get() != query:
+                return  # typed on since; a newer search is coming
+            suggestion_box.delete(0, tk.END)
+            for s in suggestions:
+                suggestion_box.insert(tk.END, s)
+
         def update_suggestions(event=None):
             query = food_entry.get()
-            suggestion_box.delete(0, tk.END)
+            if pending_search[0] is not None:
+                pending_search[0].cancel()
             if not query:
+                suggestion_box.delete(0, tk.END)
                 return
-            suggestions = search_foods(query)
-            for s in suggestions:
-                suggestion_box.insert(tk.END, s)
+            pending_search[0] = self.tasks.submit(
+                search_foods, query, owner=win,
+                on_done=lambda suggestions, q=query: show_suggestions(q, suggestions),
+                on_error=lambda e: logger.warning("Food search failed: %s", e))
         def select_suggestion(event=None):
             selection = suggestion_box.get(tk.ANCHOR)
             if selection:
@@ -389,21 +514,21 @@ class ModernNutritionTracker:
                 suggestion_box.delete(0, tk.END)
         # Bind typing + selection
         food_entry.bind("<KeyRelease>", update_suggestions)
-        suggestion_box.bind("<Double-Button-1>", select_suggestion)'''
+        suggestion_box.bind("<Double-Button-1>", select_suggestion)
 
-        ttk.Label(form, text="Quantity (grams):").grid(row=1, column=0, sticky=tk.W, pady=5)
+        ttk.Label(form, text="Quantity (grams):").grid(row=2, column=0, sticky=tk.W, pady=5)
         qty_entry = ttk.Entry(form, width=30)
-        qty_entry.grid(row=1, column=1, padx=10, pady=5)
+        qty_entry.grid(row=2, column=1, padx=10, pady=5)
 
-        ttk.Label(form, text="Date (YYYY-MM-DD):").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Label(form, text="Date (YYYY-MM-DD):").grid(row=3, column=0, sticky=tk.W, pady=5)
         date_entry = ttk.Entry(form, width=30)
         date_entry.insert(0, str(date.today()))
-        date_entry.grid(row=2, column=1, padx=10, pady=5)
+        date_entry.grid(row=3, column=1, padx=10, pady=5)
 
-        ttk.Label(form, text="Meal Type:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        ttk.Label(form, text="Meal Type:").grid(row=4, column=0, sticky=tk.W, pady=5)
         meal_var = tk.StringVar()
         meal_combo = ttk.Combobox(form, textvariable=meal_var, values=["Breakfast", "Lunch", "Dinner", "Snack"], width=27)
-        meal_combo.grid(row=3, column=1, padx=10, pady=5)
+        meal_combo.grid(row=4, column=1, padx=10, pady=5)
 
         def log_food_action():
             try:
@@ -419,19 +544,35 @@ class ModernNutritionTracker:
                     return
 
                 qty = float(qty)
-                estimated, _ = log_food(self.conn, self.current_user_id, food, qty, date_val, meal, self.usda_api)
+            except Exception as e:
+                logger.exception("Failed to log food")
+                self.show_message("Error", f"Failed to log food: {e}", "error")
+                return
+
+            def on_log_dropped(e):
+                logger.error("Queued food log was not saved", exc_info=e)
+                self.show_message("Error", f"Failed to save {qty}g of {food}: {e}", "error")
 
+            def on_logged(result):
+                estimated, row = result
+                if LOG_WRITE_BEHIND and row is not None:
+                    # row is the write-behind Future; a failed commit is reported when it happens
+                    self.tasks.watch(row, on_error=on_log_dropped)
                 msg = f"Logged {qty}g of {food}."
                 if estimated:
                     msg += " (Estimated values used)"
                 self.show_message("Success", msg)
                 win.destroy()
-            except Exception as e:
-                logger.exception("Failed to log food")
+
+            def on_log_error(e):
+                logger.error("Failed to log food", exc_info=e)
                 self.show_message("Error", f"Failed to log food: {e}", "error")
 
+            self.run_db_task(queue_food_log if LOG_WRITE_BEHIND else log_food, self.current_user_id, food, qty,
+                             date_val, meal, self.usda_api, on_done=on_logged, on_error=on_log_error, owner=win)
+
         btn_frame = ttk.Frame(form)
-        btn_frame.grid(row=4, column=0, columnspan=2, pady=12)
+        btn_frame.grid(row=5, column=0, columnspan=2, pady=12)
         ttk.Button(btn_frame, text="Log Food", command=log_food_action, style="Modern.TButton").pack(side=tk.LEFT, padx=8)
         ttk.Button(btn_frame, text="Cancel", command=win.destroy).pack(side=tk.LEFT, padx=8)
 
@@ -440,33 +581,85 @@ class ModernNutritionTracker:
             self.show_message("Error", "You must be logged in to view logs.", "error")
             return
 
-        try:
-            logs = view_past_logs(self.conn, self.current_user_id)
-            win = self.create_window("Food Logs", size="900x450")
-            ttk.Label(win, text="Your Food Log History", style='Title.TLabel').pack(pady=18)
+        user_id = self.current_user_id
+        win = self.create_window("Food Logs", size="900x500")
+        ttk.Label(win, text="Your Food Log History", style='Title.TLabel').pack(pady=18)
+
+        # filters are applied in SQL; changing them restarts paging
+        filters = ttk.Frame(win)
+        filters.pack(fill=tk.X, padx=20)
+        ttk.Label(filters, text="From:").pack(side=tk.LEFT)
+        start_entry = ttk.Entry(filters, width=12)
+        start_entry.pack(side=tk.LEFT, padx=(4, 12))
+        ttk.Label(filters, text="To:").pack(side=tk.LEFT)
+        end_entry = ttk.Entry(filters, width=12)
+        end_entry.pack(side=tk.LEFT, padx=(4, 12))
+        ttk.Label(filters, text="Meal:").pack(side=tk.LEFT)
+        meal_var = tk.StringVar(value="All")
+        ttk.Combobox(filters, textvariable=meal_var, width=10, state="readonly",
+                     values=["All", "Breakfast", "Lunch", "Dinner", "Snack"]).pack(side=tk.LEFT, padx=(4, 12))
+        status = ttk.Label(win, text="")
+
+        def page_fetcher():
+            start = start_entry.get().strip() or None
+            end = end_entry.get().strip() or None
+            for value in (start, end):
+                if value:
+                    parse_date(value)  # raises ValueError with a readable message
+            meal = None if meal_var.get() == "All" else meal_var.get()
+            return lambda conn, after, limit: view_past_logs_page(conn, user_id, limit, after, start, end, meal)
+
+        def on_loaded(total, done):
+            if total == 0:
+                status.config(text="No logs found. Start logging your meals!")
+            else:
+                status.config(text=f"{total} entries" + ("" if done else " (scroll for more)"))
+
+        cols = ("Date", "Food", "Qty (g)", "Carbs", "Calories", "Protein", "Fat")
+        table = PagedTreeview(self, win, cols, page_fetcher(), on_loaded=on_loaded)
+
+        def apply_filters():
+            try:
+                table.reset(page_fetcher())
+            except ValueError as e:
+                self.show_message("Invalid Date", str(e), "warn")
 
-            if not logs:
-                ttk.Label(win, text="No logs found. Start logging your meals!").pack(pady=50)
+        def export_filtered():
+            try:
+                start = start_entry.get().strip() or None
+                end = end_entry.get().strip() or None
+                for value in (start, end):
+                    if value:
+                        parse_date(value)
+            except ValueError as e:
+                self.show_message("Invalid Date", str(e), "warn")
                 return
+            self._export_logs(win, user_id, start, end)
+
+        ttk.Button(filters, text="Apply", command=apply_filters, style="Modern.TButton").pack(side=tk.LEFT)
+        ttk.Button(filters, text="Export...", command=export_filtered, style="Modern.TButton").pack(side=tk.LEFT, padx=8)
+        table.frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        status.pack(pady=(0, 10))
+        table.load_more()
+
+    def _export_logs(self, owner, user_id, start_date=None, end_date=None):
+        """Ask for a file and stream food logs (one user, or everyone if user_id is None) into it."""
+        path = filedialog.asksaveasfilename(
+            parent=owner, title="Export Food Logs", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Compressed CSV", "*.csv.gz"), ("JSON Lines", "*.jsonl"),
+                       ("Parquet", "*.parquet"), ("All files", "*.*")])
+        if not path:
+            return
+
+        def on_exported(result):
+            self.show_message("Export Complete", f"{result['rows']} entries written to {result['path']}")
 
-            frame = ttk.Frame(win)
-            frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-
-            cols = ("Date", "Food", "Qty (g)", "Carbs", "Calories", "Protein", "Fat")
-            tree = ttk.Treeview(frame, columns=cols, show="headings")
-            for col in cols:
-                tree.heading(col, text=col)
-                tree.column(col, width=110, anchor=tk.CENTER)
-            for log in logs:
-                tree.insert("", tk.END, values=log)
-
-            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
-            tree.configure(yscrollcommand=scrollbar.set)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            tree.pack(fill=tk.BOTH, expand=True)
-        except Exception as e:
-            logger.exception("Failed to view logs")
-            self.show_message("Error", f"Unable to load logs: {e}", "error")
+        def on_export_error(e):
+            logger.error("Export failed: %s", e)
+            self.show_message("Error", f"Export failed: {e}", "error")
+
+        self.run_db_task(export_logs, path, "food_logs", user_id, start_date, end_date,
+                         owner=owner, on_done=on_exported, on_error=on_export_error)
 
     # ---------------------------
     # Analytics (plots)
@@ -475,96 +668,75 @@ class ModernNutritionTracker:
         if self.current_user_id is None:
             self.show_message("Error", "You must be logged in to view analytics.", "error")
             return
-        try:
-            data = fetch_past_logs_for_plot(self.conn, self.current_user_id)
-            win = self.create_window("Analytics Dashboard", size="1000x700")
+        win = self.create_window("Analytics Dashboard", size="1000x700")
+        loading = self.show_loading(win, "Loading analytics...")
 
-            if data.empty:
-                ttk.Label(win, text="No data available for analytics.", style='Subtitle.TLabel').pack(pady=50)
-                return
+        def on_progress(progress):
+            loading.destroy()
+            self._show_analytics(win, progress)
 
-            notebook = ttk.Notebook(win)
-            notebook.pack(fill=tk.BOTH, expand=True)
-
-            # Calories vs Goal
-            frame1 = ttk.Frame(notebook); notebook.add(frame1, text="Calories vs Goal")
-            goal = predict_calorie_goal(self.conn, self.current_user_id)
-            self._plot_bar_with_goal(frame1, data["Date"], data["Calories"], goal, "Calories vs Goal", "Calories")
-
-            # Macronutrients
-            frame2 = ttk.Frame(notebook); notebook.add(frame2, text="Macronutrient Breakdown")
-            self._plot_pie_chart(frame2, data)
-
-            # Weight Progress
-            frame3 = ttk.Frame(notebook); notebook.add(frame3, text="Weight Progress")
-            self._plot_weight_progress(frame3, data)
-
-            # Weekly trends
-            frame4 = ttk.Frame(notebook); notebook.add(frame4, text="Weekly Trends")
-            self._plot_weekly_trends(frame4, data)
-        except Exception as e:
-            logger.exception("Analytics failed")
-            self.show_message("Error", f"Failed to load analytics: {e}", "error")
-
-    def _display_plot(self, parent, fig):
-        canvas = FigureCanvasTkAgg(fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-    def _plot_bar_with_goal(self, parent, x, y, goal, title, ylabel):
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.bar(x, y, color=COLORS.get('secondary', '#66BB6A'), label="Consumed")
-        ax.axhline(y=goal, color="red", linestyle="--", label="Goal")
-        ax.set_title(title)
-        ax.set_ylabel(ylabel)
-        ax.legend()
-        plt.tight_layout()
-        self._display_plot(parent, fig)
-
-    def _plot_pie_chart(self, parent, data):
-        try:
-            last_day = data.iloc[-1]
-            macros = [last_day["Carbs"], last_day["Protein"], last_day["Fat"]]
-            labels = ["Carbs", "Protein", "Fat"]
-            fig, ax = plt.subplots(figsize=(5, 5))
-            ax.pie(macros, labels=labels, autopct="%1.1f%%", startangle=90,
-                   colors=["#42A5F5", "#66BB6A", "#FFA726"])
-            ax.set_title(f"Macronutrient Breakdown ({last_day['Date']})")
-            plt.tight_layout()
-            self._display_plot(parent, fig)
-        except Exception:
-            ttk.Label(parent, text="Insufficient data for pie chart.").pack(pady=20)
-
-    def _plot_weight_progress(self, parent, data):
-        if self.current_user_id is not None:
-            user_data = get_user_data_for_ml(self.conn, self.current_user_id)
-        if not user_data or "weight" not in user_data:
-            ttk.Label(parent, text="No weight data available.").pack(pady=20)
-            return
-        weights = [user_data["weight"]] * len(data)
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.plot(data["Date"], weights, label="Current Weight", marker="o")
-        if "goal_weight" in user_data:
-            ax.axhline(y=user_data["goal_weight"], color="green", linestyle="--", label="Goal Weight")
-        ax.set_title("Weight Progress")
-        ax.legend()
-        plt.tight_layout()
-        self._display_plot(parent, fig)
-
-    def _plot_weekly_trends(self, parent, data):
-        weekly = data.tail(7)
-        if weekly.empty:
-            ttk.Label(parent, text="No weekly data available.").pack(pady=20)
+        def on_progress_error(e):
+            logger.error("Load analytics failed", exc_info=e)
+            loading.destroy()
+            ttk.Label(win, text=f"❌ Could not load analytics: {e}", style='Subtitle.TLabel').pack(pady=50)
+
+        self.run_db_task(load_progress, self.current_user_id, owner=win,
+                         on_done=on_progress, on_error=on_progress_error)
+
+    def _show_analytics(self, win, progress):
+        data = progress["data"]
+        if data.empty:
+            ttk.Label(win, text="No data available for analytics.", style='Subtitle.TLabel').pack(pady=50)
             return
-        fig, ax = plt.subplots(figsize=(7, 4))
-        ax.bar(weekly["Date"], weekly["Calories"], color="#42A5F5", alpha=0.7, label="Calories")
-        ax.plot(weekly["Date"], weekly["Protein"], marker="o", color="#66BB6A", label="Protein")
-        ax.plot(weekly["Date"], weekly["Carbs"], marker="s", color="#FFA726", label="Carbs")
-        ax.plot(weekly["Date"], weekly["Fat"], marker="^", color="#EF5350", label="Fat")
-        ax.set_title("Last 7 Days: Calories & Macronutrients")
-        ax.legend()
-        plt.tight_layout()
-        self._display_plot(parent, fig)
+        from aggregation import DEFAULT_RANGE, RANGES  # pandas is loaded by now
+
+        controls = ttk.Frame(win)
+        controls.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(controls, text="Range:").pack(side=tk.LEFT, padx=(0, 5))
+        range_var = tk.StringVar(value=DEFAULT_RANGE)
+        range_box = ttk.Combobox(controls, textvariable=range_var, values=list(RANGES), state="readonly", width=15)
+        range_box.pack(side=tk.LEFT)
+
+        notebook = ttk.Notebook(win)
+        notebook.pack(fill=tk.BOTH, expand=True)
+        frames = {}
+        for kind, title, size in CHART_TABS:
+            frames[kind] = ttk.Frame(notebook)
+            notebook.add(frames[kind], text=title)
+
+        def show_charts(ranged_only=False):
+            for kind, _, size in CHART_TABS:
+                if kind in RANGED_CHARTS:
+                    self._show_chart(win, frames[kind], kind, progress, size, range_var.get())
+                elif not ranged_only:
+                    self._show_chart(win, frames[kind], kind, progress, size)
+
+        range_box.bind("<<ComboboxSelected>>", lambda e: show_charts(ranged_only=True))
+        show_charts()
+
+    def _show_chart(self, win, frame, kind, progress, size, range_label=None):
+        """Render one chart off the UI thread (or take it from the chart cache) and show it in `frame`."""
+        for widget in frame.winfo_children():
+            widget.destroy()
+        loading = self.show_loading(frame, "Rendering chart...")
+
+        def show(png):
+            loading.destroy()
+            # PhotoImage reads PNG directly; keep a reference or Tk drops the image
+            image = tk.PhotoImage(data=base64.b64encode(png))
+            label = ttk.Label(frame, image=image)
+            label.image = image
+            label.pack(fill=tk.BOTH, expand=True)
+
+        def failed(e):
+            loading.destroy()
+            if not isinstance(e, ChartUnavailable):
+                logger.error("Chart %s failed", kind, exc_info=e)
+                e = "Failed to render chart."
+            ttk.Label(frame, text=str(e)).pack(pady=20)
+
+        self.run_db_task(render_chart, self.charts, self.current_user_id, kind, progress, size, range_label,
+                         owner=win, on_done=show, on_error=failed)
 
     # ---------------------------
     # Recommendations
@@ -574,38 +746,27 @@ class ModernNutritionTracker:
             self.show_message("Error", "You must be logged in to view recommendations.", "error")
             return
 
-        recs = []
-        try:
-            data = fetch_past_logs_for_plot(self.conn, self.current_user_id)
-            if data.empty:
-                recs.append("📋 No data yet. Start logging your meals to receive personalized insights.")
-            else:
-                avg_cal = data["Calories"].mean()
-                goal = predict_calorie_goal(self.conn, self.current_user_id)
-                if avg_cal < goal * 0.9:
-                    recs.append("⚡ You're consuming fewer calories than your goal. Try adding healthy calorie-dense foods like nuts, dairy, or whole grains.")
-                elif avg_cal > goal * 1.1:
-                    recs.append("⚠️ You're exceeding your calorie goal. Cut down on sugary drinks and fried snacks.")
-                else:
-                    recs.append("✅ Great job! Your calorie intake is well balanced with your goal.")
+        win = self.create_window("AI Recommendations", size="650x450")
+        ttk.Label(win, text="Personalized Recommendations", style='Title.TLabel').pack(pady=12)
+        loading = self.show_loading(win)
 
-                avg_protein = data["Protein"].mean()
-                if avg_protein < 50:
-                    recs.append("🍗 Increase protein — eggs, beans, tofu, or lean meats help.")
+        def show(progress):
+            loading.destroy()
+            self._show_recommendations(win, progress)
 
-                avg_carbs = data["Carbs"].mean()
-                if avg_carbs < 130:
-                    recs.append("🥦 Consider more complex carbs (brown rice, oats, vegetables).")
+        def show_error(e):
+            logger.error("Recommendations error", exc_info=e)
+            loading.destroy()
+            self._show_recommendations(win, None, e)
 
-                avg_fat = data["Fat"].mean()
-                if avg_fat > 70:
-                    recs.append("🧈 Consider reducing saturated fats and fried foods.")
-        except Exception as e:
-            logger.exception("Recommendations error")
-            recs.append(f"❌ Could not load recommendations: {e}")
+        self.run_db_task(load_progress, self.current_user_id, owner=win, on_done=show, on_error=show_error)
+
+    def _show_recommendations(self, win, progress, error=None):
+        if error is not None:
+            recs = [f"❌ Could not load recommendations: {error}"]
+        else:
+            recs = progress["recommendations"]
 
-        win = self.create_window("AI Recommendations", size="650x450")
-        ttk.Label(win, text="Personalized Recommendations", style='Title.TLabel').pack(pady=12)
         text_box = scrolledtext.ScrolledText(win, wrap=tk.WORD, width=75, height=25)
         text_box.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
         for rec in recs:
@@ -619,39 +780,81 @@ class ModernNutritionTracker:
         if not self.is_admin:
             self.show_message("Access Denied", "You must be an admin to access this feature.", "error")
             return
-        try:
-            users = get_all_users(self.conn)
-            win = self.create_window("Admin Panel - All Users", size="950x500")
-            ttk.Label(win, text="Registered Users", style='Title.TLabel').pack(pady=18)
-            if not users:
-                ttk.Label(win, text="No registered users found.").pack(pady=50)
-                return
+        win = self.create_window("Admin Panel - All Users", size="1100x600")
+        ttk.Label(win, text="Registered Users", style='Title.TLabel').pack(pady=18)
+
+        filters = ttk.Frame(win)
+        filters.pack(fill=tk.X, padx=20)
+        ttk.Label(filters, text="Username:").pack(side=tk.LEFT)
+        prefix_entry = ttk.Entry(filters, width=14)
+        prefix_entry.pack(side=tk.LEFT, padx=(4, 10))
+        ttk.Label(filters, text="Role:").pack(side=tk.LEFT)
+        role_var = tk.StringVar(value="All")
+        ttk.Combobox(filters, textvariable=role_var, width=7, state="readonly",
+                     values=["All", "Admins", "Users"]).pack(side=tk.LEFT, padx=(4, 10))
+        ttk.Label(filters, text="Activity:").pack(side=tk.LEFT)
+        activity_var = tk.StringVar(value="All")
+        ttk.Combobox(filters, textvariable=activity_var, width=10,
+                     values=["All", "Low", "Moderate", "High"]).pack(side=tk.LEFT, padx=(4, 10))
+        ttk.Label(filters, text="Joined:").pack(side=tk.LEFT)
+        created_from_entry = ttk.Entry(filters, width=11)
+        created_from_entry.pack(side=tk.LEFT, padx=(4, 2))
+        ttk.Label(filters, text="to").pack(side=tk.LEFT)
+        created_to_entry = ttk.Entry(filters, width=11)
+        created_to_entry.pack(side=tk.LEFT, padx=(2, 10))
+        ttk.Label(filters, text="Sort:").pack(side=tk.LEFT)
+        sort_var = tk.StringVar(value="id")
+        ttk.Combobox(filters, textvariable=sort_var, width=9, state="readonly",
+                     values=list(USER_SORTS)).pack(side=tk.LEFT, padx=(4, 4))
+        desc_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filters, text="Desc", variable=desc_var).pack(side=tk.LEFT, padx=(0, 10))
+        status = ttk.Label(win, text="")
+
+        def page_fetcher():
+            created_from = created_from_entry.get().strip() or None
+            created_to = created_to_entry.get().strip() or None
+            for value in (created_from, created_to):
+                if value:
+                    parse_date(value)  # raises ValueError with a readable message
+            query = dict(sort=sort_var.get(), descending=desc_var.get(),
+                           username_prefix=prefix_entry.get().strip() or None,
+                           is_admin={"All": None, "Admins": True, "Users": False}[role_var.get()],
+                           activity_level=None if activity_var.get() in ("", "All") else activity_var.get(),
+                           created_from=created_from, created_to=created_to)
+            return lambda conn, after, limit: get_users_page(conn, limit, after, **query)
+
+        def on_loaded(total, done):
+            if total == 0:
+                status.config(text="No registered users found.")
+            else:
+                status.config(text=f"{total} users" + ("" if done else " (scroll for more)"))
 
-            frame = ttk.Frame(win)
-            frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-            cols = ("ID", "Username", "Age", "Gender", "Height", "Weight", "Goal Weight", "Activity Level", "Weight Goal", "Is Admin")
-            tree = ttk.Treeview(frame, columns=cols, show="headings", selectmode="browse")
-            for col in cols:
-                tree.heading(col, text=col)
-                tree.column(col, anchor=tk.CENTER, width=90)
-            for user in users:
-                tree.insert("", tk.END, values=user)
-            tree.pack(fill=tk.BOTH, expand=True)
-            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
-            tree.configure(yscrollcommand=scrollbar.set)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-            btn_frame = ttk.Frame(win)
-            btn_frame.pack(pady=12)
-            ttk.Button(btn_frame, text="Promote/Demote", style='Modern.TButton',
-                       command=lambda: self._toggle_admin_status(tree, win)).pack(side=tk.LEFT, padx=8)
-            ttk.Button(btn_frame, text="Reset Password", style='Modern.TButton',
-                       command=lambda: self._reset_user_password(tree)).pack(side=tk.LEFT, padx=8)
-            ttk.Button(btn_frame, text="Delete User", style='Modern.TButton',
-                       command=lambda: self._delete_user(tree, win)).pack(side=tk.LEFT, padx=8)
-        except Exception as e:
-            logger.exception("Admin panel failed")
-            self.show_message("Error", f"Failed to load user data: {e}", "error")
+        # Is Admin stays last: the action handlers unpack (id, username, ..., is_admin)
+        cols = ("ID", "Username", "Age", "Gender", "Activity Level", "Weight Goal", "Logs", "Last Log", "Joined", "Is Admin")
+        table = PagedTreeview(self, win, cols, page_fetcher(), col_width=95, on_loaded=on_loaded)
+        tree = table.tree
+
+        def apply_filters():
+            try:
+                table.reset(page_fetcher())
+            except ValueError as e:
+                self.show_message("Invalid Date", str(e), "warn")
+
+        ttk.Button(filters, text="Apply", command=apply_filters, style="Modern.TButton").pack(side=tk.LEFT)
+        table.frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        status.pack()
+
+        btn_frame = ttk.Frame(win)
+        btn_frame.pack(pady=12)
+        ttk.Button(btn_frame, text="Promote/Demote", style='Modern.TButton',
+                   command=lambda: self._toggle_admin_status(tree, win)).pack(side=tk.LEFT, padx=8)
+        ttk.Button(btn_frame, text="Reset Password", style='Modern.TButton',
+                   command=lambda: self._reset_user_password(tree)).pack(side=tk.LEFT, padx=8)
+        ttk.Button(btn_frame, text="Delete User", style='Modern.TButton',
+                   command=lambda: self._delete_user(tree, win)).pack(side=tk.LEFT, padx=8)
+        ttk.Button(btn_frame, text="Export All Logs", style='Modern.TButton',
+                   command=lambda: self._export_logs(win, None)).pack(side=tk.LEFT, padx=8)
+        table.load_more()
 
     def _get_selected_user(self, tree):
         sel = tree.selection()
@@ -665,78 +868,68 @@ class ModernNutritionTracker:
         if not user:
             return
         user_id, username, *_, is_admin = user
-        try:
-            new_status = not bool(is_admin)
-            set_admin_status(self.conn, user_id, new_status)
+        new_status = not bool(is_admin)
+
+        def on_changed(_):
             self.show_message("Success", f"{username} is now {'an Admin' if new_status else 'a regular user'}.")
             win.destroy()
             self.show_all_users_window()
-        except Exception as e:
-            logger.exception("Toggle admin failed")
+
+        def on_change_error(e):
+            logger.error("Toggle admin failed", exc_info=e)
             self.show_message("Error", f"Failed to change status: {e}", "error")
 
+        self.run_db_task(set_admin_status, user_id, new_status, owner=win,
+                         on_done=on_changed, on_error=on_change_error)
+
     def _reset_user_password(self, tree):
         user = self._get_selected_user(tree)
         if not user:
             return
         user_id, username, *_ = user
         new_pw = simpledialog.askstring("Reset Password", f"Enter new password for {username}:")
-        if new_pw:
-            try:
-                reset_user_password(self.conn, user_id, new_pw)
-                self.show_message("Success", f"Password reset successfully for {username}.")
-            except Exception as e:
-                logger.exception("Reset password failed")
-                self.show_message("Error", f"Password reset failed: {e}", "error")
+        if not new_pw:
+            return
+
+        def on_reset(_):
+            self.show_message("Success", f"Password reset successfully for {username}.")
+
+        def on_reset_error(e):
+            logger.error("Reset password failed", exc_info=e)
+            self.show_message("Error", f"Password reset failed: {e}", "error")
+
+        # password hashing is deliberately slow; keep it off the Tk thread
+        self.run_db_task(reset_user_password, user_id, new_pw, owner=tree.winfo_toplevel(),
+                         on_done=on_reset, on_error=on_reset_error)
 
     def _delete_user(self, tree, win):
         user = self._get_selected_user(tree)
         if not user:
             return
         user_id, username, *_ = user
-        if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {username}?"):
-            try:
-                delete_user(self.conn, user_id)
-                self.show_message("Deleted", f"User {username} and related logs removed.")
-                win.destroy()
-                self.show_all_users_window()
-            except Exception as e:
-                logger.exception("Delete user failed")
-                self.show_message("Error", f"Failed to delete user: {e}", "error")
+        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {username}?"):
+            return
+
+        def on_deleted(_):
+            self.show_message("Deleted", f"User {username} and related logs removed.")
+            win.destroy()
+            self.show_all_users_window()
+
+        def on_delete_error(e):
+            logger.error("Delete user failed: %s", e)
+            self.show_message("Error", f"Failed to delete user: {e}", "error")
+
+        # chunked purge of a heavy account can take seconds; keep the window responsive
+        self.run_db_task(delete_user, user_id, owner=win, on_done=on_deleted, on_error=on_delete_error)
 
     # ---------------------------
     # Achievements
     # ---------------------------
-    def get_achievements(self):
-        achievements = []
-        try:
-            data = fetch_past_logs_for_plot(self.conn, self.current_user_id)
-            if not data.empty:
-                achievements.append({"title": "🥇 First Log", "description": "You've started your journey — great first step!", "progress": 100, "tier": "bronze"})
-            streak = get_user_streak(self.conn, self.current_user_id) if self.current_user_id else 0
-            if streak >= 7:
-                achievements.append({"title": "📅 7-Day Streak", "description": "Amazing consistency! You've logged for 7 days straight!", "progress": 100, "tier": "silver"})
-            elif streak > 0:
-                achievements.append({"title": "📆 Streak in Progress", "description": f"Current streak: {streak} days. Keep it going!", "progress": int(min(100, (streak / 7) * 100)), "tier": "bronze"})
-
-            if not data.empty:
-                if self.current_user_id is not None:
-                    goal = predict_calorie_goal(self.conn, self.current_user_id)
-                hit_goal_days = ((data["Calories"] >= goal * 0.9) & (data["Calories"] <= goal * 1.1)).sum()
-                if hit_goal_days >= 5:
-                    achievements.append({"title": "🎯 Calorie Goal Master", "description": "You've consistently hit your calorie goals this week!", "progress": 100, "tier": "gold"})
-                elif hit_goal_days > 0:
-                    achievements.append({"title": "🎯 Calorie Tracker", "description": f"You hit your calorie goal {hit_goal_days} times this week!", "progress": int(min(100, (hit_goal_days / 5) * 100)), "tier": "bronze"})
-
-            protein_days = (data["Protein"] >= 50).sum() if not data.empty else 0
-            if protein_days >= 5:
-                achievements.append({"title": "💪 Protein Pro", "description": "You've reached your protein goal consistently this week!", "progress": 100, "tier": "silver"})
-            elif protein_days > 0:
-                achievements.append({"title": "💪 Protein Progress", "description": f"Protein goal achieved on {protein_days} days.", "progress": int(min(100, (protein_days / 5) * 100)), "tier": "bronze"})
-        except Exception as e:
-            logger.exception("Get achievements failed")
-            achievements.append({"title": "❌ Error Loading Data", "description": "Could not load your achievements at this time.", "progress": 0, "tier": "bronze"})
-        return achievements
+    def get_achievements(self, progress):
+        """Achievement cards from load_progress() output (None if loading failed)."""
+        if progress is None:
+            return [{"title": "❌ Error Loading Data", "description": "Could not load your achievements at this time.", "progress": 0, "tier": "bronze"}]
+        return progress["achievements"]
 
     def get_daily_tip(self):
         tips = [
@@ -754,6 +947,122 @@ class ModernNutritionTracker:
         return random.choice(tips)
 
 
+def load_progress(conn, user_id):
+    """
+    Everything the dashboard, analytics and recommendations need, computed
+    in one background task by the analytics engine.
+    """
+    from analytics import analyze_user  # pulls in pandas/numpy; keep it off the startup path
+    return analyze_user(conn, user_id)
+
+
+def queue_food_log(conn, user_id, food, qty, date_val, meal, usda_api):
+    """log_food for the write-behind mode: returns once queued, the writer thread commits it."""
+    return queue_log_food(user_id, food, qty, date_val, meal, usda_api)
+
+
+def render_chart(conn, charts, user_id, kind, progress, size, range_label=None):
+    """
+    PNG bytes for one analytics tab; `progress` is what load_progress
+    returned. With a range_label the series is re-read bucketed and
+    downsampled to fit the chart width instead of using the full history.
+    """
+    data = progress["data"]
+    if range_label is not None:
+        from aggregation import fetch_series, max_points_for_width
+        data = fetch_series(conn, user_id, range_label, max_points_for_width(size[0]))
+    params = {}
+    if kind == "calories":
+        params = {"goal": progress["goal"], "bucket": data.attrs.get("bucket", "day")}
+    elif kind == "weight":
+        profile = get_user_data_for_ml(conn, user_id) or {}
+        params = {"weight": profile.get("weight"), "goal_weight": profile.get("goal_weight")}
+    return charts.render(user_id, kind, data, size, **params)
+
+
+# ---------------------------
+# PagedTreeview (UI helper)
+# ---------------------------
+class PagedTreeview:
+    """
+    Treeview that loads rows lazily, a page at a time, fetching the next page
+    in the background when the user scrolls near the bottom.
+    fetch_page(conn, after, limit) -> (rows, next_cursor); next_cursor None ends paging.
+
+    This is lazy loading, not virtualization: pages are appended and never
+    evicted, so rows scrolled through stay in the Treeview until reset().
+    It bounds the cost of opening the view, not of scrolling to the end.
+    """
+
+    def __init__(self, app, parent, columns, fetch_page, page_size=200, col_width=110, on_loaded=None):
+        self.app = app
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.on_loaded = on_loaded
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings")
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=col_width, anchor=tk.CENTER)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self._cursor = None
+        self._done = False
+        self._loading = False
+        self._generation = 0
+        self._count = 0
+
+    def reset(self, fetch_page=None):
+        """Drop loaded rows (and any page in flight) and start again from the top."""
+        if fetch_page is not None:
+            self.fetch_page = fetch_page
+        self._generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self._cursor = None
+        self._done = False
+        self._loading = False
+        self._count = 0
+        self.load_more()
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # also fires with last == 1.0 while the rows still fit on screen,
+        # so short pages keep loading until the view is full
+        if float(last) > 0.9:
+            self.load_more()
+
+    def load_more(self):
+        if self._loading or self._done:
+            return
+        self._loading = True
+        generation = self._generation
+
+        def on_page(result):
+            if generation != self._generation:
+                return  # filters changed while this page was loading
+            rows, self._cursor = result
+            for row in rows:
+                self.tree.insert("", tk.END, values=row)
+            self._count += len(rows)
+            self._done = self._cursor is None
+            self._loading = False
+            if self.on_loaded:
+                self.on_loaded(self._count, self._done)
+
+        def on_error(e):
+            if generation != self._generation:
+                return
+            self._loading = False
+            self._done = True  # stop retrying on every scroll; Apply/reset tries again
+            logger.error("Failed to load page", exc_info=e)
+            self.app.show_message("Error", f"Unable to load rows: {e}", "error")
+
+        self.app.run_db_task(self.fetch_page, self._cursor, self.page_size,
+                             on_done=on_page, on_error=on_error, owner=self.frame)
+
+
 # ---------------------------
 # AchievementsSection (UI helper)
 # ---------------------------
@@ -1,38 +1,38 @@
 # usda_api.py — Local nutrition database version
-import sqlite3
+import logging
+import sys
 from typing import Optional, Dict
 
+from constant import NUTRITION_DB_FILE
+from food_catalog import get_catalog
+from instrumentation import instrument_module
+
+logger = logging.getLogger("NutriAI.USDA")
+
 class USDANutritionAPI:
     """
     Local nutrition database reader.
     Returns nutrient values for the given food and quantity (in grams).
+    Lookups are served from the shared in-memory FoodCatalog.
     """
 
-    def __init__(self, db_path: str = "database/nutrition_local.db"):
+    def __init__(self, db_path: str = NUTRITION_DB_FILE):
         self.db_path = db_path
+        self.catalog = get_catalog(db_path)
 
     def get_nutrition_for_food(self, food_name: str, quantity: float = 100.0) -> Optional[Dict[str, float]]:
         try:
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
-
-            # Look for partial match in food names
-            cur.execute(
-                "SELECT calories, carbs, protein, fat, fiber FROM foods WHERE name LIKE ? LIMIT 1",
-                (f"%{food_name.lower()}%",)
-            )
-            row = cur.fetchone()
-            conn.close()
-
-            if not row:
-                print(f"⚠️ '{food_name}' not found in local DB.")
+            per_100g = self.catalog.get(food_name)
+
+            if not per_100g:
+                logger.info("'%s' not found in local DB.", food_name)
                 return None
 
-            keys = ["calories", "carbs", "protein", "fat", "fiber"]
             ratio = quantity / 100.0
-            return {k: round(v * ratio, 2) for k, v in dict(zip(keys, row)).items()}
+            return {k: round(v * ratio, 2) for k, v in per_100g.items()}
 
         except Exception as e:
-            print(f"Database error: {e}")
+            logger.error("Database error: %s", e)
             return None
-# Example usage:
+
+instrument_module(sys.modules[__name__])
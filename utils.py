@@ -1,29 +1,146 @@
 # utils.py
 import os
 import hashlib
+import hmac
 import binascii
+import threading
+import time
 from datetime import datetime
-from typing import Union
+from typing import Optional, Tuple, Union
 
-from constant import PWD_HASH_ITERATIONS, PWD_HASH_NAME, PWD_SALT_BYTES
+from cache import LRUCache
+from constant import (PWD_HASH_ALGORITHM, PWD_HASH_ITERATIONS, PWD_HASH_MIN_ITERATIONS, PWD_HASH_NAME,
+                      PWD_HASH_TARGET_MS, PWD_SALT_BYTES, PWD_SCRYPT_N, PWD_SCRYPT_P, PWD_SCRYPT_R,
+                      PWD_VERIFY_CACHE_SIZE, PWD_VERIFY_CACHE_TTL)
+
+# Bare hex digests written before hashes carried their parameters
+LEGACY_ALGORITHM = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 150_000
 
 def generate_salt():
     return os.urandom(PWD_SALT_BYTES)
 
-def hash_password(password: Union[str, bytes], salt: bytes):
+_calibrated_iterations = None
+_calibration_lock = threading.Lock()
+
+def calibrate_iterations(target_ms: float, sample_iterations: int = 20_000) -> int:
+    """PBKDF2 iterations that take about target_ms on this machine (at least PWD_HASH_MIN_ITERATIONS)."""
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac(PWD_HASH_NAME, b"calibration", b"\0" * PWD_SALT_BYTES, sample_iterations)
+    per_iteration_ms = (time.perf_counter() - start) * 1000 / sample_iterations
+    iterations = int(target_ms / per_iteration_ms) // 1000 * 1000
+    return max(PWD_HASH_MIN_ITERATIONS, iterations)
+
+def pbkdf2_iterations() -> int:
+    """Iterations for new hashes: calibrated once per process if PWD_HASH_TARGET_MS is set."""
+    global _calibrated_iterations
+    if not PWD_HASH_TARGET_MS:
+        return PWD_HASH_ITERATIONS
+    with _calibration_lock:
+        if _calibrated_iterations is None:
+            _calibrated_iterations = calibrate_iterations(PWD_HASH_TARGET_MS)
+    return _calibrated_iterations
+
+def default_hash_params(algorithm: str) -> dict:
+    """The configured cost for `algorithm` ("scrypt" or "pbkdf2_<hash>")."""
+    if algorithm == "scrypt":
+        return {"n": PWD_SCRYPT_N, "r": PWD_SCRYPT_R, "p": PWD_SCRYPT_P}
+    if algorithm.startswith("pbkdf2_"):
+        return {"i": pbkdf2_iterations()}
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+def current_hash_params() -> Tuple[str, dict]:
+    algorithm = "scrypt" if PWD_HASH_ALGORITHM == "scrypt" else "pbkdf2_" + PWD_HASH_NAME
+    return algorithm, default_hash_params(algorithm)
+
+def _derive(password: bytes, salt: bytes, algorithm: str, params: dict) -> bytes:
+    if algorithm == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * p + 1024 * 1024)
+    if algorithm.startswith("pbkdf2_"):
+        return hashlib.pbkdf2_hmac(algorithm[len("pbkdf2_"):], password, salt, params["i"])
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+def parse_password_hash(stored: str) -> Tuple[str, dict, str]:
+    """
+    Split a stored hash into (algorithm, params, hex digest), e.g.
+    "pbkdf2_sha256$i=150000$ab12..." or "scrypt$n=16384,r=8,p=1$cd34...".
+    A bare hex digest is a legacy PBKDF2-SHA256 hash at 150k iterations.
     """
-    Return hex-encoded hash for storage and hex-encoded salt.
-    Uses PBKDF2-HMAC with SHA-256.
+    if "$" not in stored:
+        return LEGACY_ALGORITHM, {"i": LEGACY_ITERATIONS}, stored
+    algorithm, raw_params, digest = stored.split("$", 2)
+    params = {}
+    for pair in raw_params.split(","):
+        key, _, value = pair.partition("=")
+        params[key] = int(value)
+    return algorithm, params, digest
+
+def hash_password(password: Union[str, bytes], salt: bytes, algorithm: Optional[str] = None,
+                  params: Optional[dict] = None):
+    """
+    Return the encoded hash for storage ("<algorithm>$<params>$<hex digest>")
+    and the hex-encoded salt. Uses the configured algorithm and cost unless
+    given explicitly; an algorithm without params gets its configured cost.
     """
     if isinstance(password, str):
         password = password.encode("utf-8")
-    dk = hashlib.pbkdf2_hmac(PWD_HASH_NAME, password, salt, PWD_HASH_ITERATIONS)
-    return binascii.hexlify(dk).decode(), binascii.hexlify(salt).decode()
+    if algorithm is None:
+        algorithm, params = current_hash_params()
+    elif params is None:
+        params = default_hash_params(algorithm)
+    dk = _derive(password, salt, algorithm, params)
+    encoded_params = ",".join(f"{k}={v}" for k, v in params.items())
+    return f"{algorithm}${encoded_params}${binascii.hexlify(dk).decode()}", binascii.hexlify(salt).decode()
 
-def verify_password(password: str, stored_hash_hex: str, stored_salt_hex: str) -> bool:
-    salt = binascii.unhexlify(stored_salt_hex.encode())
-    h, _ = hash_password(password, salt)
-    return h == stored_hash_hex
+def needs_rehash(stored_hash: str) -> bool:
+    """
+    True if the stored hash uses another algorithm or a lower cost than new
+    hashes would. Only a lower cost counts: calibrated PBKDF2 iterations vary
+    a little per process, and a stronger hash is never downgraded.
+    """
+    if "$" not in stored_hash:
+        return True
+    algorithm, params, _ = parse_password_hash(stored_hash)
+    current_algorithm, current_params = current_hash_params()
+    if algorithm != current_algorithm:
+        return True
+    return any(params.get(k, 0) < v for k, v in current_params.items())
+
+# Recently verified (password, stored hash) pairs, so repeat logins within
+# the TTL skip the KDF. Keys are an HMAC under a per-process random key, so
+# no password material is kept; a changed hash or salt never matches an old
+# entry. Only successful verifications are cached; ttl 0 disables it.
+verify_cache = LRUCache(max_items=PWD_VERIFY_CACHE_SIZE, ttl=PWD_VERIFY_CACHE_TTL)
+_verify_cache_key = os.urandom(32)
+
+def _verify_entry(password: bytes, stored_hash: str, stored_salt_hex: str) -> bytes:
+    material = b"\0".join([stored_hash.encode(), stored_salt_hex.encode(), password])
+    return hmac.new(_verify_cache_key, material, hashlib.sha256).digest()
+
+def verify_password(password: str, stored_hash_hex: str, stored_salt_hex: str, use_cache: bool = True) -> bool:
+    """
+    Check a password against a stored hash in any supported format. A
+    malformed hash or salt fails the check instead of raising.
+    """
+    password_bytes = password.encode("utf-8") if isinstance(password, str) else password
+    use_cache = use_cache and bool(verify_cache.ttl)
+    try:
+        if use_cache:
+            entry = _verify_entry(password_bytes, stored_hash_hex, stored_salt_hex)
+            if verify_cache.get(entry):
+                return True
+        algorithm, params, digest = parse_password_hash(stored_hash_hex)
+        salt = binascii.unhexlify(stored_salt_hex.encode())
+        dk = _derive(password_bytes, salt, algorithm, params)
+        ok = hmac.compare_digest(binascii.hexlify(dk).decode(), digest)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # binascii.Error is a ValueError; TypeError/AttributeError cover NULL columns
+        warn(f"Unreadable stored password hash ({type(e).__name__}); treating it as a failed login")
+        return False
+    if ok and use_cache:
+        verify_cache.put(entry, True)
+    return ok
 
 def parse_date(date_str: str):
     """
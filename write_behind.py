@@ -0,0 +1,214 @@
+# write_behind.py
+"""
+Write-behind queue for food_logs with group commit.
+
+    queue = get_write_behind()                 # one per database file
+    future = queue.submit(row)                 # row as for db.log_foods_batch_db
+    row_id = future.result()                   # wait until committed, or don't
+
+Callers put rows on an in-process queue; a single writer thread drains it
+and commits up to GROUP_ROWS rows per transaction, waiting at most
+GROUP_MS for a batch to fill. One writer means no contention for the
+sqlite write lock, and one commit per batch instead of per row. Each
+submit() returns a Future that resolves to the row id once the row is
+durable. Cancelling it before the writer picks the row up drops the row.
+Pending rows are flushed by close() / shutdown_write_behind(), which run
+at interpreter exit and from the Tk app's exit_program.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from constant import DB_FILE
+from db import log_food_db, log_foods_batch_db
+from db_pool import get_pool
+from instrumentation import span
+from migrations import migrate
+
+logger = logging.getLogger("NutriAI.WriteBehind")
+
+GROUP_ROWS = 500        # commit after this many rows...
+GROUP_MS = 20           # ...or this long after the first row of a batch
+MAX_PENDING = 50_000    # submit() blocks once this many rows are queued
+FULL_BACKOFF = 0.005    # seconds between retries while the queue is full
+
+_STOP = object()
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class WriteBehindQueue:
+    def __init__(self, db_file: str = DB_FILE, group_rows: int = GROUP_ROWS, group_ms: float = GROUP_MS,
+                 max_pending: int = MAX_PENDING):
+        self.db_file = db_file
+        self.group_rows = group_rows
+        self.group_ms = group_ms
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.rows_written = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="nutriai-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: tuple) -> Future:
+        """
+        Queue one food_logs row (user_id, food_name, quantity, carbs, calories,
+        protein, fat, fiber, date, meal_type). The Future resolves to its id.
+        """
+        future = Future()
+        if not self._put((row, future)):
+            raise RuntimeError("write-behind queue is closed")
+        return future
+
+    def _put(self, item) -> bool:
+        """
+        Queue item unless closed (False then). The lock is held only around a
+        non-blocking put, so nothing lands behind close()'s stop marker, yet
+        a full queue is waited on without it (_fail_pending needs the lock).
+        """
+        while True:
+            with self._lock:
+                if self._closed:
+                    return False
+                try:
+                    self._queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    pass
+            time.sleep(FULL_BACKOFF)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far is committed. False on timeout."""
+        marker = _Flush()
+        if not self._put(marker):
+            self._thread.join(timeout)  # close() drains the queue itself
+            return not self._thread.is_alive()
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting rows, commit the ones already queued and stop the writer."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("write-behind writer still busy after %ss; %d item(s) queued",
+                           timeout, self._queue.qsize())
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, float]:
+        return {"batches": self.batches, "rows": self.rows_written, "errors": self.errors,
+                "pending": self.pending(),
+                "avg_batch": round(self.rows_written / self.batches, 1) if self.batches else None}
+
+    # --- writer thread ---
+
+    def _run(self):
+        # own connection: pooled ones can all be leased to request threads
+        try:
+            conn = get_pool(self.db_file, migrate).dedicated_connection()
+        except Exception as e:
+            logger.exception("Write-behind writer cannot open %s", self.db_file)
+            self._fail_pending(e)
+            return
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch, markers = [], []
+            deadline = time.monotonic() + self.group_ms / 1000
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _Flush):
+                    markers.append(item)
+                    break  # commit now rather than waiting for the batch to fill
+                row, future = item
+                if future.set_running_or_notify_cancel():
+                    batch.append((row, future))
+                if len(batch) >= self.group_rows:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(conn, batch)
+            for marker in markers:
+                marker.done.set()
+        conn.close()
+
+    def _fail_pending(self, error: Exception):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, _Flush):
+                item.done.set()
+            elif item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(error)
+
+    def _commit(self, conn, batch: List[tuple]):
+        rows = [row for row, _ in batch]
+        try:
+            with span("write_behind.commit") as s:
+                s.rows = len(rows)
+                ids = log_foods_batch_db(conn, rows)
+        except Exception as e:
+            # one bad row must not lose the rest: retry them one by one
+            logger.warning("Group commit of %d row(s) failed (%s); retrying individually", len(rows), e)
+            for row, future in batch:
+                try:
+                    future.set_result(log_food_db(conn, *row))
+                    self.rows_written += 1
+                except Exception as row_error:
+                    self.errors += 1
+                    logger.error("Dropped food log for user %s (%s): %s", row[0], row[1], row_error)
+                    future.set_exception(row_error)
+            self.batches += 1
+            return
+        self.batches += 1
+        self.rows_written += len(rows)
+        for (_, future), row_id in zip(batch, ids):
+            future.set_result(row_id)
+
+
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_behind(db_file: str = DB_FILE) -> WriteBehindQueue:
+    """The shared queue for a database file, started on first use."""
+    with _queues_lock:
+        wb = _queues.get(db_file)
+        if wb is None:
+            wb = _queues[db_file] = WriteBehindQueue(db_file)
+        return wb
+
+
+def shutdown_write_behind(timeout: Optional[float] = None):
+    """Flush and stop every shared queue (safe to call more than once)."""
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for wb in queues:
+        wb.close(timeout)
+
+
+atexit.register(shutdown_write_behind)